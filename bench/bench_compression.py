@@ -0,0 +1,43 @@
+# Степень сжатия против времени сохранения и загрузки для каждого формата
+# и кодека: помогает выбрать кодек для холодного архива заметок.
+# Запуск из корня проекта: python bench/bench_compression.py [число заметок]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import COMPRESSION_CODECS, NoteManager
+from synthetic import fill
+
+NOTES = 100_000
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else NOTES
+    print(f"{size} заметок")
+    print(f"{'файл':<16} {'размер, МБ':>11} {'сжатие':>7} {'сохранение, с':>14} {'загрузка, с':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("json", "csv", "jsonl"):
+            plain_size = None
+            for suffix in ("",) + tuple(COMPRESSION_CODECS):
+                name = f"notes.{extension}{suffix}"
+                path = os.path.join(directory, name)
+                manager = NoteManager(path, fsync='never')
+                fill(manager, size)
+                started = time.perf_counter()
+                manager.save_notes()
+                save_time = time.perf_counter() - started
+                started = time.perf_counter()
+                # Замеряется разбор файла, а не чтение снимка
+                NoteManager(path, snapshot=False)
+                load_time = time.perf_counter() - started
+                file_size = os.path.getsize(path)
+                plain_size = plain_size or file_size
+                print(f"{name:<16} {file_size / 1e6:>11.2f} {plain_size / file_size:>6.1f}x"
+                      f" {save_time:>14.2f} {load_time:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
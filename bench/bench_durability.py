@@ -0,0 +1,65 @@
+# Цена надёжности записи: задержка и пропускная способность add_note при
+# политиках fsync always/periodic/never для .json, .csv и журнала .jsonl.
+# Для .json политика влияет только на перезапись: always и periodic сбрасывают
+# временный файл на диск (always - ещё и каталог), never - нет
+# Запуск из корня проекта: python bench/bench_durability.py [заметок в файле] [операций]
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import FSYNC_POLICIES, NoteManager
+from synthetic import fill
+
+NOTES = 10_000
+OPERATIONS = 200
+
+
+def prepare(path, size, policy):
+    manager = NoteManager(path, fsync=policy)
+    fill(manager, size)
+    manager.save_notes()
+    return manager
+
+
+def run(manager, operations):
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for number in range(operations):
+            started = time.perf_counter()
+            manager.add_note(f"Новая заметка {number}", "Текст заметки " * 10)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else NOTES
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else OPERATIONS
+    print(f"{size} заметок в файле, {operations} вызовов add_note")
+    print(f"{'формат':<7} {'fsync':<9} {'среднее, мс':>12} {'p95, мс':>9} {'операций/с':>11} {'МБ/с':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("json", "csv", "jsonl"):
+            for policy in FSYNC_POLICIES:
+                path = os.path.join(directory, f"{policy}.{extension}")
+                manager = prepare(path, size, policy)
+                size_before = os.path.getsize(path)
+                latencies = run(manager, operations)
+                total = sum(latencies)
+                # .json каждая операция переписывает целиком, а в .csv новые
+                # строки и в журнал записи только дописываются
+                if extension == "json":
+                    written = (size_before + os.path.getsize(path)) / 2 * operations
+                else:
+                    written = os.path.getsize(path) - size_before
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(f"{extension:<7} {policy:<9} {total / operations * 1000:>12.2f} {p95 * 1000:>9.2f}"
+                      f" {operations / total:>11.0f} {written / total / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Замер поиска заметки по номеру на хранилищах от 1 тыс. до 1 млн заметок.
+# Запуск из корня проекта: python bench/bench_get.py [размер ...]
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Note, NoteManager
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 100_000
+
+
+def build_manager(size, directory):
+    # Файл не создаётся: заметки кладём прямо в индекс, чтобы замерять только поиск
+    manager = NoteManager(os.path.join(directory, "bench.json"))
+    now = datetime.now()
+    for note_id in range(1, size + 1):
+        manager.notes_by_id[note_id] = Note(note_id, "Заголовок", "Текст", now, now)
+    return manager
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'заметок':>10} {'get(), нс':>12} {'in, нс':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            manager = build_manager(size, directory)
+            ids = [(i * 7919) % size + 1 for i in range(LOOKUPS)]
+            get_time = timeit.timeit(lambda: [manager.get(note_id) for note_id in ids], number=1)
+            in_time = timeit.timeit(lambda: [note_id in manager for note_id in ids], number=1)
+            print(f"{size:>10} {get_time / LOOKUPS * 1e9:>12.1f} {in_time / LOOKUPS * 1e9:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
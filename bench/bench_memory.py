@@ -0,0 +1,55 @@
+# Память на одну заметку: прежнее представление (обычный объект с __dict__
+# и двумя datetime) против Note со __slots__ и временем в целых секундах.
+# Запуск из корня проекта: python bench/bench_memory.py [размер ...]
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Note
+
+SIZES = [100_000, 1_000_000]
+
+
+class LegacyNote:
+    def __init__(self, note_id, title, body, created_at, updated_at):
+        self.note_id = note_id
+        self.title = title
+        self.body = body
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+
+def measure(note_class, size, shared_text):
+    # shared_text=True - у всех заметок одни и те же строки, и замер
+    # показывает только накладные расходы самого объекта заметки
+    start = datetime(2024, 1, 1)
+    tracemalloc.start()
+    notes = {}
+    for note_id in range(1, size + 1):
+        moment = start + timedelta(seconds=note_id * 37)
+        if shared_text:
+            title, body = "Заметка", "Текст заметки"
+        else:
+            title, body = f"Заметка {note_id}", f"Текст заметки {note_id}"
+        notes[note_id] = note_class(note_id, title, body, moment, moment + timedelta(hours=1))
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / size
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'заметок':>10} {'строки':>8} {'было, байт':>12} {'стало, байт':>12} {'экономия':>10}")
+    for size in sizes:
+        for shared_text in (False, True):
+            before = measure(LegacyNote, size, shared_text)
+            after = measure(Note, size, shared_text)
+            label = "общие" if shared_text else "свои"
+            print(f"{size:>10} {label:>8} {before:>12.0f} {after:>12.0f} {1 - after / before:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Разбор и форматирование времени заметок: datetime.strptime/strftime против
+# parse_timestamp/format_timestamp, а также полная загрузка notes.csv.
+# Запуск из корня проекта: python bench/bench_timestamps.py [число строк]
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import (TIME_FORMAT, Note, NoteManager, format_timestamp, from_timestamp, parse_timestamp,
+                  to_timestamp)
+
+ROWS = 1_000_000
+
+
+def write_csv(path, rows):
+    start = datetime(2023, 1, 1)
+    with open(path, "w", encoding="utf-8", newline='') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(["#meta", "next_id", rows + 1])
+        writer.writerow(["Номер заметки", "Заголовок", "Текст", "Дата создания", "Дата последнего изменения"])
+        for note_id in range(1, rows + 1):
+            created_at = start + timedelta(seconds=note_id * 29)
+            updated_at = created_at + timedelta(minutes=note_id % 600)
+            writer.writerow([note_id, f"Заметка {note_id}", "Текст заметки",
+                             created_at.strftime(TIME_FORMAT), updated_at.strftime(TIME_FORMAT)])
+
+
+def load_with_strptime(path):
+    # Загрузка в том виде, в каком она была до быстрого разбора
+    notes = {}
+    with open(path, "r", encoding="utf-8") as file:
+        reader = csv.reader(file, delimiter=';')
+        next(reader)
+        next(reader)
+        for row in reader:
+            notes[int(row[0])] = Note(int(row[0]), row[1], row[2],
+                                      datetime.strptime(row[3], TIME_FORMAT),
+                                      datetime.strptime(row[4], TIME_FORMAT))
+    return notes
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def report(name, before, after):
+    print(f"{name:<24} {before:>10.2f} {after:>10.2f} {before / after:>8.1f}x")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "notes.csv")
+        write_csv(path, rows)
+        with open(path, "r", encoding="utf-8") as file:
+            reader = csv.reader(file, delimiter=';')
+            next(reader)
+            next(reader)
+            stamps = [row[3] for row in reader]
+        values = [parse_timestamp(stamp) for stamp in stamps]
+        moments = [from_timestamp(value) for value in values]
+
+        print(f"{rows} строк, секунды")
+        print(f"{'операция':<24} {'strptime':>10} {'быстрый':>10} {'ускорение':>9}")
+        report("разбор времени",
+               timed(lambda: [to_timestamp(datetime.strptime(stamp, TIME_FORMAT)) for stamp in stamps]),
+               timed(lambda: [parse_timestamp(stamp) for stamp in stamps]))
+        report("форматирование времени",
+               timed(lambda: [moment.strftime(TIME_FORMAT) for moment in moments]),
+               timed(lambda: [format_timestamp(value) for value in values]))
+        report("загрузка notes.csv", timed(load_with_strptime, path), timed(NoteManager, path, snapshot=False))
+
+
+if __name__ == "__main__":
+    main()
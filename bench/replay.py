@@ -0,0 +1,113 @@
+# Повтор журнала операций (NoteManager(..., oplog=...) или python main.py --record)
+# на любом хранилище: пропускная способность и задержки p50/p95/p99 по типам операций.
+# Хранилище при повторе изменяется - запускайте на копии.
+# Запуск из корня проекта:
+#     python bench/replay.py operations.jsonl --file copy.db --speed 2 --concurrency 4
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import OPLOG_PATH, NoteManager, run_operation
+
+
+def read_log(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def percentile(latencies, fraction):
+    # latencies отсортированы; метод ближайшего ранга
+    return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+
+def replay(manager, operations, speed, concurrency):
+    # Операции выдаются по расписанию журнала: промежутки между ними делятся на speed,
+    # при speed=0 - без пауз. Рабочие потоки выполняют их по одной под общей
+    # блокировкой - хранилище не рассчитано на параллельные вызовы. Задержка
+    # считается от момента, когда операция должна была начаться, поэтому ожидание
+    # в очереди за другими потоками в неё входит; без пауз - от момента, когда
+    # рабочий поток взял операцию, иначе в задержку попала бы вся очередь
+    tasks = queue.Queue()
+    results = []
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            scheduled, operation = task
+            if scheduled is None:
+                scheduled = time.perf_counter()
+            with lock:
+                result = run_operation(manager, operation)
+            results.append((operation.get('op'), time.perf_counter() - scheduled, result['ok']))
+
+    workers = [threading.Thread(target=work) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    first = operations[0].get('ts', 0) if operations else 0
+    for operation in operations:
+        scheduled = None
+        if speed:
+            scheduled = started + (operation.get('ts', first) - first) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        tasks.put((scheduled, operation))
+    for _ in workers:
+        tasks.put(None)
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    groups = {}
+    for op, latency, ok in results:
+        groups.setdefault(op, []).append((latency, ok))
+    groups = sorted(groups.items())
+    groups.append(("всего", [(latency, ok) for _, latency, ok in results]))
+    print(f"{'операция':<10} {'число':>7} {'ошибок':>7} {'операций/с':>11}"
+          f" {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for op, items in groups:
+        latencies = sorted(latency for latency, _ in items)
+        errors = sum(not ok for _, ok in items)
+        print(f"{op:<10} {len(items):>7} {errors:>7} {len(items) / elapsed:>11.1f}"
+              f" {percentile(latencies, 0.5) * 1000:>9.2f} {percentile(latencies, 0.95) * 1000:>9.2f}"
+              f" {percentile(latencies, 0.99) * 1000:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повтор журнала операций на хранилище заметок")
+    parser.add_argument("log", nargs="?", default=OPLOG_PATH, help=f"журнал операций (по умолчанию {OPLOG_PATH})")
+    parser.add_argument("--file", required=True, help="хранилище, на котором повторяются операции")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="во сколько раз быстрее записи повторять операции, 0 - без пауз (по умолчанию 1)")
+    parser.add_argument("--concurrency", type=int, default=1, help="число параллельных клиентов (по умолчанию 1)")
+    args = parser.parse_args()
+
+    operations = read_log(args.log)
+    if not operations:
+        print("Журнал операций пуст.")
+        return
+    manager = NoteManager(args.file)
+    try:
+        results, elapsed = replay(manager, operations, args.speed, args.concurrency)
+    finally:
+        manager.close()
+    print(f"{len(operations)} операций из {args.log} на {args.file} за {elapsed:.2f} с"
+          f" (скорость {args.speed:g}, клиентов {args.concurrency})")
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
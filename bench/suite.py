@@ -0,0 +1,154 @@
+# Набор замеров основных операций NoteManager на синтетических заметках
+# (bench/synthetic.py) для .json и .csv от 1 тыс. до 1 млн заметок.
+# Результаты пишутся в JSON, а compare сравнивает два таких файла и
+# завершается с кодом 1, если какая-то операция замедлилась больше порога.
+# Запуск из корня проекта:
+#     python bench/suite.py run --sizes 1000 100000 --output base.json
+#     python bench/suite.py compare base.json new.json --threshold 0.25
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import NoteManager
+from synthetic import SPAN_DAYS, START, fill
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FORMATS = ["json", "csv"]
+REPEAT = 5
+# Чтения занимают микросекунды, поэтому один замер - среднее по стольким вызовам
+READ_CALLS = 100
+RESULTS_PATH = "bench_results.json"
+THRESHOLD = 0.25
+# Разница меньше этой считается шумом таймера, сколько бы процентов она ни составляла
+NOISE_SECONDS = 50e-6
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def measure(path, extension, size, repeat, seed):
+    # Время каждой операции в секундах: список из repeat замеров
+    rng = random.Random(seed)
+    timings = {}
+    manager = NoteManager(path, snapshot=False)
+    fill(manager, size, seed)
+    timings["save_notes"] = [timed(manager.save_notes) for _ in range(repeat)]
+    timings["load_notes"] = [timed(NoteManager, path, snapshot=False) for _ in range(repeat)]
+    # Первая загрузка со снимком разбирает текст и пишет снимок, остальные читают его
+    manager = NoteManager(path)
+    manager.close()
+    timings["load_notes/snapshot"] = [timed(NoteManager, path) for _ in range(repeat)]
+    os.remove(manager.snapshot_path)
+
+    manager = NoteManager(path, snapshot=False)
+    note_ids = [rng.randint(1, size) for _ in range(READ_CALLS)]
+    days = [START.date() + timedelta(days=rng.randrange(SPAN_DAYS)) for _ in range(READ_CALLS)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings["list_note_by_id"] = [
+            timed(lambda: [manager.list_note_by_id(note_id, extension) for note_id in note_ids]) / READ_CALLS
+            for _ in range(repeat)]
+        timings["list_notes_by_date"] = [
+            timed(lambda: [manager.list_notes_by_date(day) for day in days]) / READ_CALLS
+            for _ in range(repeat)]
+        timings["add_note"] = [timed(manager.add_note, "Новая заметка", "Текст новой заметки")
+                               for _ in range(repeat)]
+        timings["edit_note"] = [timed(manager.edit_note, rng.randint(1, size), "Заголовок", "Новый текст")
+                                for _ in range(repeat)]
+        note_ids = rng.sample(range(1, size + 1), repeat)
+        timings["delete_note_by_id"] = [timed(manager.delete_note_by_id, note_id) for note_id in note_ids]
+    manager.close()
+    return timings
+
+
+def run(sizes, formats, repeat, seed, output):
+    results = []
+    print(f"{'формат':<7} {'заметок':>9} {'операция':<20} {'медиана, мс':>12} {'минимум, мс':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            for extension in formats:
+                path = os.path.join(directory, f"notes_{size}.{extension}")
+                for operation, samples in measure(path, extension, size, repeat, seed).items():
+                    result = {"format": extension, "notes": size, "operation": operation,
+                              "median": statistics.median(samples), "min": min(samples)}
+                    results.append(result)
+                    print(f"{extension:<7} {size:>9} {operation:<20} {result['median'] * 1000:>12.3f}"
+                          f" {result['min'] * 1000:>12.3f}")
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": date.today().isoformat(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=4)
+    print(f"Результаты записаны в {output}")
+
+
+def read_results(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return {(result["format"], result["notes"], result["operation"]): result
+                for result in json.load(file)["results"]}
+
+
+def compare(base_path, new_path, threshold):
+    # Сравниваются минимумы: они меньше медиан зависят от фоновой нагрузки.
+    # Метрики, которых нет в одном из файлов, пропускаются
+    base, new = read_results(base_path), read_results(new_path)
+    regressions = 0
+    print(f"{'формат':<7} {'заметок':>9} {'операция':<20} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    for key in sorted(base.keys() & new.keys()):
+        before, after = base[key]["min"], new[key]["min"]
+        change = after / before - 1 if before else 0.0
+        regressed = change > threshold and after - before > NOISE_SECONDS
+        regressions += regressed
+        extension, size, operation = key
+        print(f"{extension:<7} {size:>9} {operation:<20} {before * 1000:>10.3f} {after * 1000:>10.3f}"
+              f" {change:>+10.0%}{'  замедление' if regressed else ''}")
+    if regressions:
+        print(f"Замедлилось операций: {regressions} (порог {threshold:.0%})")
+        return 1
+    print(f"Замедлений больше {threshold:.0%} нет")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры операций NoteManager на синтетических заметках")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="выполнить замеры")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="число заметок")
+    run_parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="форматы файла")
+    run_parser.add_argument("--repeat", type=int, default=REPEAT,
+                            help=f"сколько раз замерять каждую операцию (по умолчанию {REPEAT})")
+    run_parser.add_argument("--seed", type=int, default=0, help="зерно генератора заметок")
+    run_parser.add_argument("--output", default=RESULTS_PATH, help=f"файл результатов (по умолчанию {RESULTS_PATH})")
+    compare_parser = commands.add_parser("compare", help="сравнить два файла результатов")
+    compare_parser.add_argument("base", help="результаты до изменения")
+    compare_parser.add_argument("new", help="результаты после изменения")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                                help=f"допустимое замедление, доля (по умолчанию {THRESHOLD})")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.sizes, args.formats, args.repeat, args.seed, args.output)
+        return 0
+    return compare(args.base, args.new, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# Детерминированный генератор заметок для замеров: русский текст с редкими
+# латинскими словами, числами, переносами строк и символами, которые CSV
+# приходится экранировать; длина текста распределена логнормально, время
+# создания разбросано по нескольким годам, часть заметок потом правилась.
+# Одинаковый seed даёт одинаковые заметки на любой машине.
+import math
+import random
+from datetime import datetime
+
+from main import Note, to_timestamp
+
+WORDS = (
+    "заметка", "список", "покупки", "встреча", "проект", "идея", "книга", "отчёт", "позвонить",
+    "купить", "молоко", "хлеб", "срочно", "завтра", "понедельник", "вторник", "пятница", "неделя",
+    "работа", "дом", "дача", "машина", "ремонт", "врач", "запись", "билеты", "поезд", "отпуск",
+    "день", "рождения", "подарок", "маме", "сестре", "коллегам", "обсудить", "бюджет", "задача",
+    "сделать", "проверить", "отправить", "письмо", "договор", "счёт", "оплатить", "интернет",
+    "квартира", "собрание", "вопросы", "ответы", "напомнить", "рецепт", "суп", "пирог", "яйца",
+    "сахар", "мука", "фильм", "посмотреть", "прочитать", "статья", "ссылка", "пароль", "новый",
+    "старый", "важно", "потом", "утром", "вечером", "после", "обеда", "если", "успею", "и", "в",
+    "на", "с", "не", "что", "это", "как", "по", "для", "к", "из", "до", "ещё", "уже", "всё",
+    "email", "backup", "deploy", "review", "TODO",
+)
+PUNCTUATION = (";", " -", ".", ".", ".", "!", "?", ":", ' - "цитата".')
+START = datetime(2021, 1, 1)
+SPAN_DAYS = 3 * 365
+SENTENCES = 4096
+SENTENCE_WORDS = (3, 12)
+BODY_SENTENCES_MEDIAN = 4
+BODY_SENTENCES_SIGMA = 1.0
+BODY_SENTENCES_MAX = 400
+
+
+def generate_sentences(rng):
+    # Тексты и заголовки собираются из общих наборов: по слову на миллион
+    # заметок генератор работал бы дольше самих замеров
+    sentences = []
+    for _ in range(SENTENCES):
+        words = rng.choices(WORDS, k=rng.randint(*SENTENCE_WORDS))
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words)), str(rng.randrange(1, 10_000)))
+        if rng.random() < 0.3:
+            words[rng.randrange(len(words) - 1) if len(words) > 1 else 0] += rng.choice(PUNCTUATION[:2])
+        sentences.append(" ".join(words).capitalize() + rng.choice(PUNCTUATION[2:]))
+    return sentences
+
+
+def generate_body(rng, sentences):
+    if rng.random() < 0.03:
+        return ""
+    count = min(BODY_SENTENCES_MAX,
+                max(1, int(rng.lognormvariate(math.log(BODY_SENTENCES_MEDIAN), BODY_SENTENCES_SIGMA))))
+    parts = rng.choices(sentences, k=count)
+    # Примерно каждое восьмое предложение начинает новый абзац
+    for position in range(rng.randrange(8), count - 1, 8):
+        parts[position] += "\n"
+    return " ".join(parts).replace("\n ", "\n")
+
+
+def generate_titles(rng):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(1, 6))).capitalize() for _ in range(SENTENCES)]
+
+
+def generate_title(rng, titles, note_id):
+    title = titles[int(rng.random() * len(titles))]
+    if rng.random() < 0.2:
+        title += f" №{note_id}"
+    return title
+
+
+def generate_notes(count, seed=0, first_id=1):
+    # Заметки с номерами first_id..first_id + count - 1, время - целые секунды
+    rng = random.Random(seed)
+    sentences = generate_sentences(rng)
+    titles = generate_titles(rng)
+    start = to_timestamp(START)
+    span = SPAN_DAYS * 86400
+    for note_id in range(first_id, first_id + count):
+        created_ts = start + int(rng.random() * span)
+        updated_ts = created_ts
+        if rng.random() < 0.4:
+            updated_ts += int(rng.expovariate(1 / (30 * 86400)))
+        yield Note(note_id, generate_title(rng, titles, note_id), generate_body(rng, sentences), created_ts, updated_ts)
+
+
+def fill(manager, count, seed=0):
+    # Кладёт заметки прямо в хранилище в памяти; на диск - save_notes()
+    note_ids = manager.reserve_ids(count)
+    for note in generate_notes(count, seed, note_ids.start):
+        manager.notes_by_id[note.note_id] = note
@@ -1,154 +1,2129 @@
+import argparse
+import atexit
+import bz2
+import gzip
+import hashlib
 import json
+import lzma
+import marshal
+import mmap
 import os
 import csv
+import gc
+import io
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from collections.abc import Iterator
+from functools import wraps
+from itertools import repeat
 from datetime import datetime, timedelta, timezone
 
+import profiling
+from search import SearchIndex, add_bm25_scores, tokenize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+
+
+def current_moscow_time():
+    # Время хранится без часового пояса (как и в файлах), иначе его нельзя
+    # сравнивать с датами, прочитанными из файла
+    return datetime.now(timezone(timedelta(hours=3))).replace(tzinfo=None)
+
+
+def to_timestamp(moment):
+    # Секунды от 01-01-1970 по "настенному" времени заметки, без учёта пояса
+    return (moment.replace(tzinfo=None) - EPOCH) // SECOND
+
+
+def from_timestamp(timestamp):
+    return EPOCH + timedelta(seconds=timestamp)
+
+
+TIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+# Кэши начала дня: "ДД-ММ-ГГГГ" -> секунды и номер дня -> "ДД-ММ-ГГГГ ".
+# В файле заметок одни и те же даты повторяются тысячи раз
+_day_starts = {}
+_day_prefixes = {}
+# "00" -> 0 ... "59" -> 59: разбор поля времени и проверка диапазона - один поиск в словаре
+_SIXTY = {f"{number:02d}": number for number in range(60)}
+
+
+def parse_timestamp(text):
+    # Быстрый разбор строки формата TIME_FORMAT в целые секунды: срезы и словари
+    # вместо datetime.strptime. Быстрый путь берёт только поля из цифр ASCII -
+    # int() принял бы и "-1", "+1", " 1"; остальное разбирает strptime, он же
+    # и даёт ValueError на неверной строке (в том числе на секундах 60 и 61)
+    hours = _SIXTY.get(text[11:13])
+    minutes = _SIXTY.get(text[14:16])
+    seconds = _SIXTY.get(text[17:])
+    if (hours is None or minutes is None or seconds is None or hours > 23
+            or text[10] != ' ' or text[13] != ':' or text[16] != ':'):
+        return to_timestamp(datetime.strptime(text, TIME_FORMAT))
+    day_start = _day_starts.get(text[:10])
+    if day_start is None:
+        digits = text[:2] + text[3:5] + text[6:10]
+        if text[2] != '-' or text[5] != '-' or len(digits) != 8 or not digits.isdigit() or not digits.isascii():
+            return to_timestamp(datetime.strptime(text, TIME_FORMAT))
+        day_start = to_timestamp(datetime(int(text[6:10]), int(text[3:5]), int(text[:2])))
+        if len(_day_starts) > 100_000:
+            _day_starts.clear()
+        _day_starts[text[:10]] = day_start
+    return day_start + hours * 3600 + minutes * 60 + seconds
+
+
+def format_timestamp(timestamp):
+    day, seconds = divmod(timestamp, 86400)
+    prefix = _day_prefixes.get(day)
+    if prefix is None:
+        prefix = from_timestamp(day * 86400).strftime("%d-%m-%Y ")
+        if len(_day_prefixes) > 100_000:
+            _day_prefixes.clear()
+        _day_prefixes[day] = prefix
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{prefix}{hours:02d}:{minutes:02d}:{seconds:02d}"
+
 
 class Note:
+    # __slots__ убирает у каждой заметки словарь атрибутов, а время хранится
+    # целыми секундами вместо двух объектов datetime: на миллионе заметок
+    # это основная часть памяти. created_at/updated_at по-прежнему отдают datetime
+    __slots__ = ('note_id', 'title', 'body', 'created_ts', 'updated_ts')
+
     def __init__(self, note_id, title, body, created_at=None, updated_at=None):
+        # Время можно передать как datetime или сразу как целые секунды
         self.note_id = note_id
         self.title = title
         self.body = body
-        self.created_at = created_at if created_at else self.get_current_time()
-        self.updated_at = updated_at if updated_at else self.get_current_time()
+        if created_at is None:
+            created_at = self.get_current_time()
+        if updated_at is None:
+            updated_at = self.get_current_time()
+        self.created_ts = created_at if isinstance(created_at, int) else to_timestamp(created_at)
+        self.updated_ts = updated_at if isinstance(updated_at, int) else to_timestamp(updated_at)
 
     def get_current_time(self):
         return datetime.now()
 
+    @property
+    def created_at(self):
+        return from_timestamp(self.created_ts)
+
+    @created_at.setter
+    def created_at(self, moment):
+        self.created_ts = to_timestamp(moment)
+
+    @property
+    def updated_at(self):
+        return from_timestamp(self.updated_ts)
+
+    @updated_at.setter
+    def updated_at(self, moment):
+        self.updated_ts = to_timestamp(moment)
+
         
     def __repr__(self):
-        created_at_str = self.created_at.strftime("%d-%m-%Y %H:%M:%S")
-        updated_at_str = self.updated_at.strftime("%d-%m-%Y %H:%M:%S")
+        created_at_str = format_timestamp(self.created_ts)
+        updated_at_str = format_timestamp(self.updated_ts)
         return f"Номер заметки: {self.note_id}\nЗаголовок: {self.title}\nТекст: {self.body}\nСоздана в: {created_at_str}\nОбновлена в: {updated_at_str}"
 
 
+class LazyNote(Note):
+    # Заметка без текста в памяти: body читается из снимка по смещению и длине
+    # при обращении. После правки текст хранится в обычном слоте body из Note
+    __slots__ = ('body_store', 'body_offset', 'body_length')
+    _stored_body = Note.body
+
+    def __init__(self, note_id, title, created_ts, updated_ts, body_store, body_offset, body_length):
+        self.note_id = note_id
+        self.title = title
+        self.created_ts = created_ts
+        self.updated_ts = updated_ts
+        self.body_store = body_store
+        self.body_offset = body_offset
+        self.body_length = body_length
+
+    @property
+    def body(self):
+        if self.body_store is None:
+            return self._stored_body
+        return self.body_store.read(self.body_offset, self.body_length)
+
+    @body.setter
+    def body(self, body):
+        self._stored_body = body
+        self.body_store = None
+
+
+class BodyStore:
+    # Область текстов в файле снимка. Недавно прочитанные тексты держатся
+    # в LRU-кэше, пока их суммарный размер не превышает cache_size байт
+    def __init__(self, path, cache_size):
+        self.file = open(path, "rb")
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+    def read(self, offset, length):
+        # Пустой текст занимает ноль байт и делит смещение со следующим - в кэш он не попадает
+        if not length:
+            return ""
+        with self.lock:
+            body = self.cache.get(offset)
+            if body is not None:
+                self.cache.move_to_end(offset)
+                return body
+            if self.file.closed:
+                # Хранилище закрыто вместе с NoteManager.close() - файл открывается снова при чтении
+                self.reopen()
+            self.file.seek(offset)
+            body = self.file.read(length).decode("utf-8")
+            if length <= self.cache_size:
+                self.cache[offset] = body
+                self.cached_bytes += length
+                while self.cached_bytes > self.cache_size:
+                    _, evicted = self.cache.popitem(last=False)
+                    self.cached_bytes -= len(evicted.encode("utf-8"))
+            return body
+
+    def reopen(self):
+        self.file = open(self.file.name, "rb")
+
+    def close(self):
+        self.file.close()
+
+
+def _column_property(column):
+    # Свойство представления, читающее и пишущее его ячейку в столбце таблицы
+    def get(view):
+        table = view.table
+        return getattr(table, column)[table.positions[view.note_id]]
+
+    def set(view, value):
+        table = view.table
+        getattr(table, column)[table.positions[view.note_id]] = value
+
+    return property(get, set)
+
+
+class NoteView(Note):
+    # Заметка-представление строки NoteTable: хранит только таблицу и номер,
+    # поля читаются и пишутся прямо в столбцах. Строка ищется по номеру при
+    # каждом обращении, поэтому представление переживает уплотнение таблицы
+    __slots__ = ('table',)
+
+    def __init__(self, table, note_id):
+        self.table = table
+        self.note_id = note_id
+
+    title = _column_property('titles')
+    body = _column_property('bodies')
+    created_ts = _column_property('created_column')
+    updated_ts = _column_property('updated_column')
+
+
+_MISSING = object()
+
+
+class NoteTable:
+    # Столбцовое хранилище вместо словаря номер -> Note: номера и даты лежат
+    # в array('q'), заголовки и тексты - в параллельных списках. Снаружи таблица
+    # ведёт себя как словарь, а вместо объектов Note отдаёт NoteView. Удалённая
+    # строка помечается нулевым номером; когда таких больше половины, столбцы уплотняются
+    def __init__(self):
+        self.ids = array('q')
+        self.created_column = array('q')
+        self.updated_column = array('q')
+        self.titles = []
+        self.bodies = []
+        self.positions = {}
+        self.dead = 0
+
+    @classmethod
+    def from_columns(cls, ids, titles, bodies, created, updated):
+        table = cls()
+        table.ids = array('q', ids)
+        table.created_column = array('q', created)
+        table.updated_column = array('q', updated)
+        table.titles = list(titles)
+        table.bodies = list(bodies)
+        table.positions = dict(zip(ids, range(len(ids))))
+        return table
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, note_id):
+        return note_id in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def keys(self):
+        return self.positions.keys()
+
+    def values(self):
+        return (NoteView(self, note_id) for note_id in self.positions)
+
+    def items(self):
+        return ((note_id, NoteView(self, note_id)) for note_id in self.positions)
+
+    def get(self, note_id, default=None):
+        if note_id in self.positions:
+            return NoteView(self, note_id)
+        return default
+
+    def __getitem__(self, note_id):
+        if note_id not in self.positions:
+            raise KeyError(note_id)
+        return NoteView(self, note_id)
+
+    def __setitem__(self, note_id, note):
+        row = self.positions.get(note_id)
+        if row is None:
+            self.positions[note_id] = len(self.ids)
+            self.ids.append(note_id)
+            self.created_column.append(note.created_ts)
+            self.updated_column.append(note.updated_ts)
+            self.titles.append(note.title)
+            self.bodies.append(note.body)
+        else:
+            self.created_column[row] = note.created_ts
+            self.updated_column[row] = note.updated_ts
+            self.titles[row] = note.title
+            self.bodies[row] = note.body
+
+    def pop(self, note_id, default=_MISSING):
+        # Как у словаря, возвращается сама заметка - отдельной копией, ведь строка освобождается
+        row = self.positions.pop(note_id, None)
+        if row is None:
+            if default is _MISSING:
+                raise KeyError(note_id)
+            return default
+        note = Note(note_id, self.titles[row], self.bodies[row],
+                    self.created_column[row], self.updated_column[row])
+        self.ids[row] = 0
+        self.titles[row] = self.bodies[row] = None
+        self.dead += 1
+        if self.dead > len(self.positions):
+            self._compact()
+        return note
+
+    def _compact(self):
+        rows = list(self.positions.values())
+        self.ids = array('q', (self.ids[row] for row in rows))
+        self.created_column = array('q', (self.created_column[row] for row in rows))
+        self.updated_column = array('q', (self.updated_column[row] for row in rows))
+        self.titles = [self.titles[row] for row in rows]
+        self.bodies = [self.bodies[row] for row in rows]
+        self.positions = dict(zip(self.ids, range(len(rows))))
+        self.dead = 0
+
+    def between(self, start, end):
+        # Заметки, созданные или изменённые в полуинтервале [start, end): один проход
+        # по столбцам дат, а с NumPy - векторное сравнение над теми же буферами без копий
+        if numpy is not None and self.ids:
+            ids = numpy.frombuffer(self.ids, dtype=numpy.int64)
+            created = numpy.frombuffer(self.created_column, dtype=numpy.int64)
+            updated = numpy.frombuffer(self.updated_column, dtype=numpy.int64)
+            mask = (((created >= start) & (created < end)) | ((updated >= start) & (updated < end))) & (ids != 0)
+            note_ids = ids[mask].tolist()
+            # Массивы NumPy держат буферы столбцов, а array нельзя расширить, пока буфер занят
+            del ids, created, updated, mask
+        else:
+            note_ids = [note_id for note_id, created_ts, updated_ts
+                        in zip(self.ids, self.created_column, self.updated_column)
+                        if note_id and (start <= created_ts < end or start <= updated_ts < end)]
+        return [NoteView(self, note_id) for note_id in note_ids]
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    # Потоковое чтение JSON-массива верхнего уровня: элементы разбираются по одному
+    # через raw_decode, поэтому в памяти держится только текущий элемент и буфер
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    position = 0
+    eof = not buffer
+
+    def skip_whitespace():
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            buffer = file.read(chunk_size)
+            position = 0
+            eof = not buffer
+
+    skip_whitespace()
+    if position >= len(buffer):
+        return
+    if buffer[position] != '[':
+        raise ValueError("Ожидался JSON-массив")
+    position += 1
+    expect_value = True
+    after_comma = False
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise ValueError("Неожиданный конец JSON-массива")
+        if buffer[position] == ']':
+            if after_comma:
+                raise ValueError("Лишняя запятая перед концом JSON-массива")
+            position += 1
+            skip_whitespace()
+            if position < len(buffer):
+                raise ValueError("Лишние данные после JSON-массива")
+            return
+        if not expect_value:
+            if buffer[position] != ',':
+                raise ValueError("Ожидалась запятая между элементами JSON-массива")
+            position += 1
+            expect_value = after_comma = True
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # Число, обрезанное концом буфера ("1." из "1.5e10"), разбирается без ошибки,
+            # поэтому значение без закрывающей скобки или кавычки считается законченным,
+            # только если за ним уже виден разделитель
+            complete = eof or (end < len(buffer) and (buffer[position] in '"[{'
+                                                      or buffer[end] in ',] \t\r\n'))
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # Элемент не поместился в буфер: дочитываем, каждый раз удваивая порцию
+            more = file.read(max(chunk_size, len(buffer) - position))
+            buffer = buffer[position:] + more
+            position = 0
+            eof = not more
+            continue
+        yield item
+        position = end
+        expect_value = after_comma = False
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+FSYNC_POLICIES = ('always', 'periodic', 'never')
+# Параметры файловых хранилищ, которых у SQLite нет
+SQLITE_UNSUPPORTED_OPTIONS = ('write_behind', 'snapshot', 'lazy_bodies', 'columnar')
+# Политики fsync в терминах SQLite: periodic - синхронизация только в ключевые моменты
+SQLITE_SYNCHRONOUS = {'always': 'FULL', 'periodic': 'NORMAL', 'never': 'OFF'}
+BATCH_INDEX_REBUILD = 1000
+WRITE_BUFFER_SIZE = 1 << 20
+STORAGE_FORMATS = ('.json', '.csv', '.jsonl')
+COMPRESSION_CODECS = {'.gz': gzip, '.xz': lzma, '.bz2': bz2}
+# Заголовок снимка: метка, версия, размер и время изменения исходного файла,
+# хэш его начала, конца и надгробий, смещение столбцов. За заголовком идут
+# тексты заметок в UTF-8 подряд, в конце - столбцы заметок через marshal
+SNAPSHOT_MAGIC = b"NOTESNAP"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct("<8sIqq16sq")
+SNAPSHOT_SAMPLE = 1 << 16
+SEARCH_INDEX_MAGIC = b"NOTESIDX"
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_HEADER = struct.Struct("<8sIqq16s")
+# Заголовок .notesbin: метка, версия, число заметок и следующий номер. Дальше
+# столбцы по 8 байт на заметку: номера (по возрастанию), даты создания и изменения,
+# 2 * число + 1 смещений текстов, затем заголовки и тексты в UTF-8 подряд
+BINARY_MAGIC = b"NOTESBIN"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sI4xqq")
+
+
+def split_storage_path(file_path):
+    # "notes.json.gz" -> ('json', gzip): формат хранения и модуль сжатия (или None)
+    base, extension = os.path.splitext(file_path)
+    codec = None
+    if extension in COMPRESSION_CODECS:
+        codec = COMPRESSION_CODECS[extension]
+        base, extension = os.path.splitext(base)
+    elif extension == '.zst':
+        raise ValueError("Сжатие zstd не входит в стандартную библиотеку, используйте .gz, .xz или .bz2")
+    if extension not in STORAGE_FORMATS:
+        return None, codec
+    return extension[1:], codec
+
+
+OPLOG_PATH = "operations.jsonl"
+
+
+class OperationLog:
+    # Журнал операций в JSON Lines: по строке на операцию в тех же словарях, что
+    # принимает пакетный режим (op и аргументы), плюс store - файл хранилища,
+    # ts - время начала и duration - длительность в секундах. Его читает bench/replay.py
+    def __init__(self, path, store):
+        self.store = store
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def write(self, operations, started, duration):
+        # Пачка из add_many и подобных записывается по операции с равной долей времени
+        share = duration / len(operations)
+        lines = "".join(json.dumps(dict(operation, store=self.store, ts=round(started, 6),
+                                        duration=round(share, 9)), ensure_ascii=False) + "\n"
+                        for operation in operations)
+        with self.lock:
+            self.file.write(lines)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def recorded(describe):
+    # Пишет вызов метода в журнал операций, если он включён. describe получает
+    # аргументы вызова и возвращает список операций. Вложенные вызовы (add_note ->
+    # add_many, list_note_by_id -> find -> get) не пишутся - только внешний
+    def decorate(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            oplog = self.oplog
+            if oplog is None or getattr(oplog.local, 'active', False):
+                return method(self, *args, **kwargs)
+            # Генераторы читаются один раз - для записи их нужно сохранить
+            args = tuple(list(arg) if isinstance(arg, Iterator) else arg for arg in args)
+            oplog.local.active = True
+            started = time.time()
+            begin = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                duration = time.perf_counter() - begin
+                oplog.local.active = False
+                operations = describe(*args, **kwargs)
+                if operations:
+                    oplog.write(operations, started, duration)
+        return wrapper
+    return decorate
+
+
+def describe_add(notes):
+    return [{'op': 'add', 'title': title, 'body': body} for title, body, *_ in notes]
+
+
+def describe_edit(notes):
+    return [{'op': 'edit', 'note_id': note_id, 'title': title, 'body': body} for note_id, title, body in notes]
+
+
+def describe_delete(note_ids):
+    return [{'op': 'delete', 'note_id': note_id} for note_id in note_ids]
+
+
+def describe_get(note_id):
+    return [{'op': 'get', 'note_id': note_id}]
+
+
+def describe_list():
+    return [{'op': 'list'}]
+
+
+def describe_between(start_date, end_date):
+    return [{'op': 'by-date', 'date': start_date.strftime("%d-%m-%Y"), 'end': end_date.strftime("%d-%m-%Y")}]
+
+
+def describe_search(query, limit=10):
+    return [{'op': 'search', 'query': query, 'limit': limit}]
+
+
+class DateIndex:
+    # Отсортированный список пар (время, номер заметки): выборка за период -
+    # два бинарных поиска и срез, то есть O(log n + k). Удалённая заметка только
+    # помечается, а помеченные пары вычищаются одним проходом, когда их
+    # становится больше половины - так удаление подряд многих заметок не квадратично
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+        self.deleted = set()
+
+    def add(self, moment, note_id):
+        insort(self.entries, (moment, note_id))
+
+    def remove(self, moment, note_id):
+        position = bisect_left(self.entries, (moment, note_id))
+        if position < len(self.entries) and self.entries[position] == (moment, note_id):
+            del self.entries[position]
+
+    def discard(self, note_id):
+        self.deleted.add(note_id)
+        if len(self.deleted) * 2 > len(self.entries):
+            deleted = self.deleted
+            self.entries = [entry for entry in self.entries if entry[1] not in deleted]
+            self.deleted = set()
+
+    def between(self, start, end):
+        # Номера заметок со временем в полуинтервале [start, end)
+        low = bisect_left(self.entries, (start,))
+        high = bisect_left(self.entries, (end,))
+        deleted = self.deleted
+        return [note_id for _, note_id in self.entries[low:high] if note_id not in deleted]
+
 
 class NoteManager:
-    def __init__(self, file_path):
+    def __new__(cls, file_path, *args, **kwargs):
+        # Файлы .db обслуживает SQLite, .notesbin - двоичный формат с чтением через mmap,
+        # каталог (путь с "/" на конце или sharded=True) - хранилище с файлом на каждый
+        # месяц, остальные форматы - этот класс
+        if cls is NoteManager:
+            if file_path.endswith('.db'):
+                cls = SqliteNoteManager
+            elif file_path.endswith('.notesbin'):
+                cls = BinaryNoteManager
+            elif kwargs.get('sharded') or file_path.endswith(('/', os.sep)):
+                cls = ShardedNoteManager
+        return super().__new__(cls)
+
+    def __init__(self, file_path, compact_ratio=2.0, compact_min_records=1000, preload=True,
+                 write_behind=False, flush_delay=1.0, flush_max_pending=100,
+                 fsync='periodic', fsync_interval=1.0, vacuum_ratio=0.25, vacuum_min_dead=100,
+                 snapshot=True, lazy_bodies=None, body_cache_size=64 << 20, columnar=False,
+                 oplog=None, sharded=False):
+        # sharded учитывается в __new__ при выборе класса, здесь он только принимается
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестная политика fsync: {fsync}")
         self.file_path = file_path
-        self.notes = []
-        self.load_notes()
+        # Формат определяется по расширению, сжатие (.gz, .xz, .bz2) - по последнему суффиксу
+        self.storage_format, self.codec = split_storage_path(file_path)
+        # Заметки хранятся в словаре номер -> заметка: он сохраняет порядок
+        # добавления и даёт поиск, правку и удаление по номеру за O(1).
+        # При preload=False файл читается при первом обращении к заметкам,
+        # а iter_notes() до этого отдаёт их потоком прямо из файла
+        self._notes_by_id = None
+        # Был ли уже полный потоковый проход по файлу (см. _streaming)
+        self._streamed = False
+        # Следующий свободный номер. Хранится в заголовке файла и только растёт,
+        # поэтому номера удалённых заметок не выдаются повторно
+        self.next_id = 1
+        # Индексы по датам создания и изменения строятся при первом запросе по дате
+        self.created_index = None
+        self.updated_index = None
+        # Полнотекстовый индекс тоже строится при первом поиске. Вместе со снимком
+        # он сохраняется при close() в notes.json.idx и в следующий раз читается оттуда
+        self.search_index = None
+        self._search_index_fingerprint = None
+        # Журнал (.jsonl) сворачивается в снимок, когда записей в нём
+        # становится больше compact_ratio * число живых заметок
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self.journal_records = 0
+        # Отложенная запись: изменения копятся в памяти и сбрасываются на диск одной
+        # записью через flush_delay секунд или после flush_max_pending операций.
+        # Эти два параметра и задают, сколько изменений может потеряться при сбое
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self.flush_max_pending = flush_max_pending
+        self._pending = []
+        self._flush_timer = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        # Когда вызывать fsync после дописывания в файл: always - каждый раз, periodic -
+        # не чаще раза в fsync_interval секунд, never - оставить сброс на диск системе.
+        # При always после замены файла синхронизируется и каталог. Полная перезапись
+        # сбрасывает временный файл на диск перед заменой при always и periodic;
+        # при never после сбоя питания файл может оказаться пустым
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._last_fsync = 0.0
+        # Размер и время изменения файла после нашей последней записи: если они
+        # совпадают, файл никто не трогал и в .csv можно дописывать новые строки
+        self._file_signature = None
+        # Удаление из .json и .csv не переписывает файл: номер заметки дописывается
+        # в файл-надгробие рядом (notes.json.deleted), а при чтении такие заметки
+        # пропускаются. Когда надгробий больше vacuum_ratio * число живых заметок
+        # (и не меньше vacuum_min_dead), файл в фоне переписывается начисто - vacuum()
+        self.vacuum_ratio = vacuum_ratio
+        self.vacuum_min_dead = vacuum_min_dead
+        self.dead_count = 0
+        self._vacuum_thread = None
+        # Двоичный снимок рядом с файлом (notes.json.snap) загружается без разбора
+        # текста и дат. Им пользуются, пока исходный файл не изменился; после
+        # разбора текста и при close() снимок записывается заново
+        self.snapshot = snapshot and self.storage_format is not None
+        self._snapshot_fingerprint = None
+        # При lazy_bodies=True в памяти остаются только номера, заголовки и даты,
+        # а тексты читаются из снимка по требованию (см. LazyNote и BodyStore).
+        # По умолчанию (None) тексты ленивые, если есть снимок и хранение не столбцовое:
+        # так загрузка из снимка не декодирует миллион текстов, которые не понадобятся
+        if lazy_bodies is None:
+            lazy_bodies = snapshot and not columnar
+        if lazy_bodies and not snapshot:
+            raise ValueError("Ленивая загрузка текстов работает только вместе со снимком")
+        self.lazy_bodies = lazy_bodies and self.snapshot
+        self.body_cache_size = body_cache_size
+        self._body_store = None
+        # При columnar=True заметки хранятся столбцами в NoteTable, а не объектами
+        # Note в словаре; выборка по дате - проход по столбцам (с NumPy, если он есть)
+        if columnar and lazy_bodies:
+            raise ValueError("Столбцовое хранение и ленивая загрузка текстов несовместимы")
+        self.columnar = columnar and self.storage_format is not None
+        # Путь к журналу операций (см. OperationLog) или None, если запись не нужна
+        self.oplog = OperationLog(oplog, file_path) if oplog else None
+        if write_behind:
+            atexit.register(self.flush)
+        if preload:
+            self.load_notes()
+
+    @property
+    def notes_by_id(self):
+        self._ensure_loaded()
+        return self._notes_by_id
+
+    def _ensure_loaded(self):
+        if self._notes_by_id is None:
+            self.load_notes()
 
-        
     def load_notes(self):
+        self._notes_by_id = NoteTable() if self.columnar else {}
         if not os.path.exists(self.file_path):
             return
+        # Загрузка создаёт миллионы объектов, и сборщик циклов успевает обойти их
+        # все много раз; циклов среди заметок нет, поэтому на время загрузки он выключается
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._load_file()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self._file_signature = self._current_signature()
+
+    def _load_file(self):
+        if self.snapshot and self._load_snapshot():
+            return
+        if self.storage_format == 'jsonl':
+            self._load_journal()
+        else:
+            deleted = self._read_tombstones()
+            for note in self._read_notes():
+                if note.note_id not in deleted:
+                    self._notes_by_id[note.note_id] = note
+            self.dead_count = len(deleted)
+            # Номер удалённой последней заметки ещё лежит в файле, но выдавать его снова нельзя
+            self.next_id = max(self.next_id, max(deleted, default=0) + 1)
+        # Файлы без заголовка (старого формата) продолжают нумерацию после максимального номера
+        self.next_id = max(self.next_id, max(self._notes_by_id, default=0) + 1)
+        if self.snapshot:
+            self._write_snapshot()
+            if self.lazy_bodies:
+                # Тексты только что записаны в снимок - дальше они читаются оттуда
+                self._load_snapshot()
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
 
-        if self.file_path.endswith('.json'):
-            with open(self.file_path, "r", encoding="utf-8") as file:
-                notes_data = json.load(file)
-                if not notes_data:
-                    return
-                self.notes = [Note(note_data['note_id'], note_data['title'], note_data['body'],
-                                created_at=datetime.strptime(note_data['created_at'], "%d-%m-%Y %H:%M:%S"),
-                                updated_at=datetime.strptime(note_data['updated_at'], "%d-%m-%Y %H:%M:%S"))
-                          for note_data in notes_data]
-        elif self.file_path.endswith('.csv'):
-            with open(self.file_path, "r", encoding="utf-8") as file:
+    def _read_notes(self):
+        # Потоковое чтение .json и .csv: заметки отдаются по одной по мере разбора файла
+        if self.storage_format == 'json':
+            with self._open_text() as file:
+                for note_data in iter_json_array(file):
+                    if 'meta' in note_data:
+                        self.next_id = max(self.next_id, note_data['meta']['next_id'])
+                        continue
+                    yield self._note_from_record(note_data)
+        elif self.storage_format == 'csv':
+            with self._open_text() as file:
                 reader = csv.reader(file, delimiter=';')
-                next(reader) 
+                header = next(reader, None)
+                if header and header[0] == '#meta':
+                    self.next_id = max(self.next_id, int(header[2]))
+                    next(reader)
                 for row in reader:
                     note_id = int(row[0])
                     title = row[1]
                     body = row[2]
-                    created_at = datetime.strptime(row[3], "%d-%m-%Y %H:%M:%S")
-                    updated_at = datetime.strptime(row[4], "%d-%m-%Y %H:%M:%S")
-                    self.notes.append(Note(note_id, title, body, created_at, updated_at))
+                    created_at = parse_timestamp(row[3])
+                    updated_at = parse_timestamp(row[4])
+                    yield Note(note_id, title, body, created_at, updated_at)
         else:
             raise ValueError("Неподдерживаемый формат файла")
 
+    def iter_notes(self):
+        # Обход заметок без построения полного списка. Если файл ещё не загружен,
+        # заметки читаются из него потоком; журнал для этого приходится проиграть целиком
+        if not self._streaming():
+            yield from self.notes_by_id.values()
+        elif os.path.exists(self.file_path):
+            yield from self._stream_notes()
+            self._streamed = True
+
+    def _stream_notes(self):
+        deleted = self._read_tombstones()
+        for note in self._read_notes():
+            if note.note_id not in deleted:
+                yield note
+
+    def _streaming(self):
+        # Читать ли заметки потоком из файла вместо загрузки: да, пока хранилище не
+        # загружено и нет свежего снимка - из снимка загрузка быстрее разбора текста.
+        # Поток выгоден только для первого запроса: следующий разобрал бы файл заново,
+        # поэтому после полного прохода хранилище загружается (и close() пишет снимок)
+        return (self._notes_by_id is None and not self._streamed and self.storage_format in ('json', 'csv')
+                and not (self.snapshot and self._snapshot_is_fresh()))
+
+    def has_notes(self):
+        # Есть ли хотя бы одна заметка; до загрузки читается только начало файла -
+        # даже при свежем снимке, чтобы проверка не загружала всё хранилище
+        if self._notes_by_id is None and self.storage_format in ('json', 'csv'):
+            if not os.path.exists(self.file_path):
+                return False
+            notes = self._stream_notes()
+            try:
+                return next(notes, None) is not None
+            finally:
+                notes.close()
+        return next(iter(self.iter_notes()), None) is not None
+
+    @property
+    def snapshot_path(self):
+        return self.file_path + ".snap"
+
+    def _source_fingerprint(self):
+        # Хэшируются только начало и конец файла: полный хэш читал бы файл целиком
+        # и съедал весь выигрыш. Правку в середине выдают размер и время изменения
+        stat = os.stat(self.file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.file_path, "rb") as file:
+            digest.update(file.read(SNAPSHOT_SAMPLE))
+            if stat.st_size > 2 * SNAPSHOT_SAMPLE:
+                file.seek(-SNAPSHOT_SAMPLE, os.SEEK_END)
+            digest.update(file.read())
+        if os.path.exists(self.tombstone_path):
+            with open(self.tombstone_path, "rb") as file:
+                digest.update(file.read())
+        return stat.st_size, stat.st_mtime_ns, digest.digest()
+
+    def _snapshot_is_fresh(self):
+        try:
+            with open(self.snapshot_path, "rb") as file:
+                magic, version, *fingerprint, _ = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return (magic == SNAPSHOT_MAGIC and version == SNAPSHOT_VERSION
+                and tuple(fingerprint) == self._source_fingerprint())
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as file:
+                header = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))
+                magic, version, *fingerprint, columns_offset = header
+                if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+                        or tuple(fingerprint) != self._source_fingerprint()):
+                    return False
+                # marshal.load читает файл мелкими порциями, loads от целого блока в разы быстрее
+                if self.lazy_bodies:
+                    file.seek(columns_offset)
+                else:
+                    texts = file.read(columns_offset - SNAPSHOT_HEADER.size)
+                data = file.read()
+            next_id, journal_records, dead_count, titles, *columns = marshal.loads(data)
+            # Числовые столбцы лежат в снимке байтами array('q'): их разбор - одно копирование
+            ids, offsets, lengths, created, updated = [array('q', column) for column in columns]
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            return False
+        if self.lazy_bodies:
+            store = BodyStore(self.snapshot_path, self.body_cache_size)
+            self._notes_by_id = dict(zip(ids, map(LazyNote, ids, titles, created, updated,
+                                                  repeat(store), offsets, lengths)))
+            self._replace_body_store(store)
+        else:
+            base = SNAPSHOT_HEADER.size
+            bodies = [texts[offset - base:offset - base + length].decode("utf-8")
+                      for offset, length in zip(offsets, lengths)]
+            if self.columnar:
+                self._notes_by_id = NoteTable.from_columns(ids, titles, bodies, created, updated)
+            else:
+                self._notes_by_id = dict(zip(ids, map(Note, ids, titles, bodies, created, updated)))
+        self.next_id = max(self.next_id, next_id)
+        self.journal_records = journal_records
+        self.dead_count = dead_count
+        self._snapshot_fingerprint = tuple(fingerprint)
+        return True
+
+    def _write_snapshot(self):
+        # Снимок - только кэш: если записать его не удалось, файл просто будет разобран заново
+        notes = list(self._notes_by_id.values())
+        fingerprint = self._source_fingerprint()
+        temp_path = self.snapshot_path + ".tmp"
+        offsets = []
+        lengths = []
+        try:
+            with open(temp_path, "wb", buffering=WRITE_BUFFER_SIZE) as file:
+                position = SNAPSHOT_HEADER.size
+                file.seek(position)
+                for note in notes:
+                    body = note.body.encode("utf-8")
+                    file.write(body)
+                    offsets.append(position)
+                    lengths.append(len(body))
+                    position += len(body)
+                file.write(marshal.dumps((
+                    self.next_id, self.journal_records, self.dead_count, [note.title for note in notes],
+                    *[array('q', column).tobytes() for column in (
+                        [note.note_id for note in notes], offsets, lengths,
+                        [note.created_ts for note in notes], [note.updated_ts for note in notes])])))
+                file.seek(0)
+                file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *fingerprint, position))
+            if self._body_store is not None:
+                # Тексты уже переписаны во временный файл; Windows не заменит снимок,
+                # пока он открыт, поэтому старое хранилище текстов закрывается до замены
+                self._body_store.close()
+            os.replace(temp_path, self.snapshot_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if self._body_store is not None and self._body_store.file.closed:
+                # Снимок не заменён - тексты по-прежнему читаются из старого
+                self._body_store.reopen()
+            return
+        self._snapshot_fingerprint = fingerprint
+        if self._body_store is not None:
+            # Старый снимок заменён: непрочитанные тексты теперь лежат в новом по новым смещениям
+            store = BodyStore(self.snapshot_path, self.body_cache_size)
+            for note, offset in zip(notes, offsets):
+                if type(note) is LazyNote and note.body_store is not None:
+                    note.body_store = store
+                    note.body_offset = offset
+            self._replace_body_store(store)
+
+    def _replace_body_store(self, store):
+        if self._body_store is not None:
+            self._body_store.close()
+        self._body_store = store
+
+    @property
+    def tombstone_path(self):
+        return self.file_path + ".deleted"
+
+    def _read_tombstones(self):
+        # Номера удалённых, но ещё не вычищенных из файла заметок - по одному на строку
+        if not os.path.exists(self.tombstone_path):
+            return set()
+        with open(self.tombstone_path, "r", encoding="utf-8") as file:
+            return {int(line) for line in file if line.strip()}
+
+    def _load_journal(self):
+        # Проигрываем журнал: put добавляет или заменяет заметку, del удаляет
+        notes_by_id = self._notes_by_id
+        records = 0
+        with self._open_text() as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                records += 1
+                if record['op'] == 'put':
+                    notes_by_id[record['note_id']] = self._note_from_record(record)
+                elif record['op'] == 'del':
+                    notes_by_id.pop(record['note_id'], None)
+                    self.next_id = max(self.next_id, record['note_id'] + 1)
+                elif record['op'] == 'meta':
+                    self.next_id = max(self.next_id, record['next_id'])
+        self.journal_records = records
+
+    def _note_from_record(self, record):
+        return Note(record['note_id'], record['title'], record['body'],
+                    created_at=parse_timestamp(record['created_at']),
+                    updated_at=parse_timestamp(record['updated_at']))
+
+    def _note_to_record(self, note):
+        return {
+            'note_id': note.note_id,
+            'title': note.title,
+            'body': note.body,
+            'created_at': format_timestamp(note.created_ts),
+            'updated_at': format_timestamp(note.updated_ts)
+        }
+
         
+    def _open_text(self):
+        # Чтение идёт потоком и через модуль сжатия, без распаковки файла целиком
+        if self.codec is None:
+            return open(self.file_path, "r", encoding="utf-8", newline='')
+        return self.codec.open(self.file_path, "rt", encoding="utf-8", newline='')
+
     def save_notes(self):
-        if self.file_path.endswith('.json'):
-            with open(self.file_path, "w", encoding="utf-8") as file:
-                json.dump([{
-                    'note_id': note.note_id,
-                    'title': note.title,
-                    'body': note.body,
-                    'created_at': note.created_at.strftime("%d-%m-%Y %H:%M:%S"),  # Преобразование в нужный формат
-                    'updated_at': note.updated_at.strftime("%d-%m-%Y %H:%M:%S")  # Преобразование в нужный формат
-                } for note in self.notes], file, ensure_ascii=False, default=str)
-        elif self.file_path.endswith('.csv'):
-            with open(self.file_path, "w", encoding="utf-8", newline='') as file:
-                writer = csv.writer(file, delimiter=';')
-                writer.writerow(["Номер заметки", "Заголовок", "Текст", "Дата создания", "Дата последнего изменения"])
-                for note in self.notes:
-                    writer.writerow([note.note_id, note.title, note.body,
-                                note.created_at.strftime("%d-%m-%Y %H:%M:%S"),  # Преобразование в нужный формат
-                                note.updated_at.strftime("%d-%m-%Y %H:%M:%S")])  # Преобразование в нужный формат
+        if self.storage_format == 'json':
+            self._write_atomically(self._write_json)
+            self._clear_tombstones()
+        elif self.storage_format == 'csv':
+            self._write_atomically(self._write_csv)
+            self._clear_tombstones()
+        elif self.storage_format == 'jsonl':
+            self.compact()
         else:
             raise ValueError("Неподдерживаемый формат файла")
 
+    def _write_json(self, file):
+        # Заметки пишутся по одной, а крупные блоки на диск собирает буфер файла
+        file.write("[" + json.dumps({'meta': {'next_id': self.next_id}}))
+        for note in self.notes_by_id.values():
+            file.write(", " + json.dumps(self._note_to_record(note), ensure_ascii=False))
+        file.write("]")
+
+    def _write_csv(self, file):
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(["#meta", "next_id", self.next_id])
+        writer.writerow(["Номер заметки", "Заголовок", "Текст", "Дата создания", "Дата последнего изменения"])
+        for note in self.notes_by_id.values():
+            writer.writerow([note.note_id, note.title, note.body,
+                        format_timestamp(note.created_ts),  # Преобразование в нужный формат
+                        format_timestamp(note.updated_ts)])  # Преобразование в нужный формат
+
+    def _write_journal(self, file):
+        file.write(json.dumps({'op': 'meta', 'next_id': self.next_id}) + "\n")
+        for note in self.notes_by_id.values():
+            record = {'op': 'put'}
+            record.update(self._note_to_record(note))
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _write_atomically(self, write, path=None, binary=False):
+        # Файл собирается рядом во временном файле и подменяет старый через os.replace:
+        # при сбое на диске остаётся либо старая, либо новая версия целиком
+        path = path or self.file_path
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "wb", buffering=WRITE_BUFFER_SIZE) as raw:
+                if binary:
+                    write(raw)
+                elif self.codec is None:
+                    file = io.TextIOWrapper(raw, encoding="utf-8", newline='', write_through=True)
+                    write(file)
+                    file.detach()
+                else:
+                    # Сжатый поток дописывается до конца при закрытии обёртки, сам файл остаётся открытым
+                    with self.codec.open(raw, "wt", encoding="utf-8", newline='') as file:
+                        write(file)
+                # Временный файл сбрасывается на диск до переименования: иначе после
+                # сбоя питания на месте файла мог бы оказаться пустой или обрезанный.
+                # При never этот риск принимается ради скорости
+                if self.fsync != 'never':
+                    raw.flush()
+                    os.fsync(raw.fileno())
+            os.replace(temp_path, path)
+            if path == self.file_path:
+                self._file_signature = self._current_signature()
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self.fsync == 'always':
+            self._sync_directory(path)
+
+    def _append_text(self, text):
+        # Сжатые файлы дописываются новым блоком (членом gzip, потоком xz/bz2) -
+        # модули сжатия читают такие склеенные файлы как один
+        with open(self.file_path, "ab") as raw:
+            if self.codec is None:
+                raw.write(text.encode("utf-8"))
+            else:
+                with self.codec.open(raw, "at", encoding="utf-8", newline='') as file:
+                    file.write(text)
+            self._sync(raw)
+        self._file_signature = self._current_signature()
+
+    def _sync(self, file):
+        file.flush()
+        if self.fsync == 'always' or (self.fsync == 'periodic'
+                                      and time.monotonic() - self._last_fsync >= self.fsync_interval):
+            os.fsync(file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def _sync_directory(self, path):
+        # Чтобы переименование пережило сбой питания, на POSIX синхронизируется и каталог
+        if os.name != 'posix':
+            return
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _clear_tombstones(self):
+        # Файл только что переписан без удалённых заметок - надгробия больше не нужны
+        if os.path.exists(self.tombstone_path):
+            os.remove(self.tombstone_path)
+        self.dead_count = 0
+
+    def _append_tombstones(self, note_ids):
+        with open(self.tombstone_path, "a", encoding="utf-8") as file:
+            file.write("".join(f"{note_id}\n" for note_id in note_ids))
+            self._sync(file)
+        self.dead_count += len(note_ids)
+        if (self.dead_count >= self.vacuum_min_dead
+                and self.dead_count > self.vacuum_ratio * len(self.notes_by_id)
+                and self._vacuum_thread is None):
+            self._vacuum_thread = threading.Thread(target=self._background_vacuum, daemon=True)
+            self._vacuum_thread.start()
+
+    def _background_vacuum(self):
+        try:
+            self.vacuum()
+        finally:
+            self._vacuum_thread = None
+
+    def vacuum(self):
+        # Переписывает файл без удалённых заметок; для журнала это его свёртка
+        with self._lock:
+            self.flush()
+            if self.storage_format == 'jsonl':
+                self.compact()
+            elif self.dead_count or os.path.exists(self.tombstone_path):
+                self.save_notes()
+
+    def compact(self):
+        # Сворачиваем журнал в снимок: по одной записи put на живую заметку
+        self._write_atomically(self._write_journal)
+        self.journal_records = len(self.notes_by_id) + 1
+
+    def _append_journal(self, records):
+        self._append_text("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self.journal_records += len(records)
+        if (self.journal_records >= self.compact_min_records
+                and self.journal_records > self.compact_ratio * len(self.notes_by_id)):
+            self.compact()
+
+    def allocate_id(self):
+        # Счётчик читается из заголовка файла, поэтому сначала загружаем заметки
+        self._ensure_loaded()
+        note_id = self.next_id
+        self.next_id += 1
+        return note_id
 
+    def reserve_ids(self, count):
+        # Блок номеров для массовой вставки: range(first, first + count). Счётчик
+        # меняется только в памяти и попадает в файл со следующей записью
+        # (save_notes(), правкой или добавлением заметки)
+        self._ensure_loaded()
+        first_id = self.next_id
+        self.next_id += count
+        return range(first_id, self.next_id)
 
+    def _commit(self, op, note):
+        if self._batch_depth:
+            self._pending.append((op, note))
+            return
+        if not self.write_behind:
+            self._persist([(op, note)])
+            return
+        self._pending.append((op, note))
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Отложенная запись: сразу, если накопилось flush_max_pending операций,
+        # иначе по таймеру через flush_delay секунд
+        if len(self._pending) >= self.flush_max_pending:
+            self.flush()
+        elif self._pending and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _persist(self, operations):
+        # Для журнала дописываем записи одним вызовом write. В .csv новые строки
+        # дописываются в конец, удаления в .json и .csv уходят в надгробия; всё
+        # остальное перезаписывает файл целиком - один раз на всю пачку операций
+        unchanged = (self._file_signature is not None
+                     and self._file_signature == self._current_signature())
+        if self.storage_format == 'jsonl':
+            records = []
+            for op, note in operations:
+                if op == 'del':
+                    records.append({'op': 'del', 'note_id': note.note_id})
+                else:
+                    record = {'op': 'put'}
+                    record.update(self._note_to_record(note))
+                    records.append(record)
+            self._append_journal(records)
+        elif (self.storage_format == 'csv' and unchanged
+              and all(op in ('add', 'del') for op, _ in operations)):
+            added = [note for op, note in operations if op == 'add']
+            if added:
+                self._append_csv_rows(added)
+            deleted = [note.note_id for op, note in operations if op == 'del']
+            if deleted:
+                self._append_tombstones(deleted)
+        elif (self.storage_format == 'json' and unchanged
+              and all(op == 'del' for op, _ in operations)):
+            self._append_tombstones([note.note_id for _, note in operations])
+        else:
+            self.save_notes()
+
+    def _append_csv_rows(self, notes):
+        # Новые заметки дописываются в конец .csv без перезаписи файла. Счётчик
+        # в строке #meta при этом не обновляется: при загрузке номер всё равно
+        # берётся не меньше максимального номера в файле
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        for note in notes:
+            writer.writerow([note.note_id, note.title, note.body,
+                             format_timestamp(note.created_ts), format_timestamp(note.updated_ts)])
+        self._append_text(buffer.getvalue())
+
+    def flush(self):
+        # Записывает на диск все отложенные изменения
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            operations, self._pending = self._pending, []
+            if operations:
+                self._persist(operations)
+
+    def close(self):
+        self.flush()
+        vacuum_thread = self._vacuum_thread
+        if vacuum_thread is not None:
+            vacuum_thread.join()
+        if self.oplog is not None:
+            self.oplog.close()
+        if (self.snapshot and self._notes_by_id is not None and os.path.exists(self.file_path)
+                and self._snapshot_fingerprint != self._source_fingerprint()):
+            self._write_snapshot()
+        if (self.snapshot and self.search_index is not None and os.path.exists(self.file_path)
+                and self._search_index_fingerprint != self._source_fingerprint()):
+            self._write_search_index()
+        if self._body_store is not None:
+            self._body_store.close()
+        if self.write_behind:
+            atexit.unregister(self.flush)
+
+
+
+    @property
+    def notes(self):
+        # Список-снимок для обхода; для поиска по номеру есть get()
+        return list(self.notes_by_id.values())
+
+    @recorded(describe_get)
+    def get(self, note_id):
+        return self.notes_by_id.get(note_id)
+
+    def _build_date_indexes(self):
+        if self.created_index is None:
+            notes_by_id = self.notes_by_id
+            self.created_index = DateIndex((note.created_ts, note.note_id) for note in notes_by_id.values())
+            self.updated_index = DateIndex((note.updated_ts, note.note_id) for note in notes_by_id.values())
+
+    def _build_search_index(self):
+        # Построение разбирает тексты всех заметок (около 4 с на 100 тыс.), чтение
+        # сохранённого индекса - в десять раз быстрее. Пока есть незаписанные изменения,
+        # файл отстаёт от памяти и сохранённый индекс ему уже не соответствует
+        if self.search_index is None:
+            notes_by_id = self.notes_by_id
+            if self.snapshot and not self._pending and os.path.exists(self.file_path):
+                self.search_index = self._load_search_index()
+            if self.search_index is None:
+                self.search_index = SearchIndex()
+                for note in notes_by_id.values():
+                    self.search_index.add(note.note_id, note.title, note.body)
+
+    @property
+    def search_index_path(self):
+        return self.file_path + ".idx"
+
+    def _load_search_index(self):
+        try:
+            with open(self.search_index_path, "rb") as file:
+                magic, version, *fingerprint = SEARCH_INDEX_HEADER.unpack(file.read(SEARCH_INDEX_HEADER.size))
+                if (magic != SEARCH_INDEX_MAGIC or version != SEARCH_INDEX_VERSION
+                        or tuple(fingerprint) != self._source_fingerprint()):
+                    return None
+                index = SearchIndex.from_state(marshal.loads(file.read()))
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            return None
+        self._search_index_fingerprint = tuple(fingerprint)
+        return index
+
+    def _write_search_index(self):
+        # Как и снимок, сохранённый индекс - только кэш: при ошибке записи он строится заново
+        fingerprint = self._source_fingerprint()
+        temp_path = self.search_index_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(SEARCH_INDEX_HEADER.pack(SEARCH_INDEX_MAGIC, SEARCH_INDEX_VERSION, *fingerprint))
+                file.write(marshal.dumps(self.search_index.state()))
+            os.replace(temp_path, self.search_index_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._search_index_fingerprint = fingerprint
+
+    def _index_note(self, note):
+        if self.created_index is not None:
+            self.created_index.add(note.created_ts, note.note_id)
+            self.updated_index.add(note.updated_ts, note.note_id)
+        if self.search_index is not None:
+            self.search_index.add(note.note_id, note.title, note.body)
+
+    def _unindex_note(self, note):
+        if self.created_index is not None:
+            self.created_index.remove(note.created_ts, note.note_id)
+            self.updated_index.remove(note.updated_ts, note.note_id)
+        if self.search_index is not None:
+            self.search_index.remove(note.note_id)
+
+    def _drop_note(self, note):
+        # Удалённая заметка в индексах по датам только помечается
+        if self.created_index is not None:
+            self.created_index.discard(note.note_id)
+            self.updated_index.discard(note.note_id)
+        if self.search_index is not None:
+            self.search_index.remove(note.note_id)
+
+    def __len__(self):
+        return len(self.notes_by_id)
+
+    def __contains__(self, note_id):
+        return note_id in self.notes_by_id
+
+    @recorded(describe_list)
     def print_notes(self):
-        if not self.notes:
+        # До загрузки хранилища заметки печатаются потоком прямо из файла
+        empty = True
+        for note in self.iter_notes():
+            empty = False
+            print(note)
+            print()
+        if empty:
             print("!!! Нет ни одной заметки.")
-        else:
-            for note in self.notes:
-                print(note)
-                print()
+
+    @contextmanager
+    def batch(self):
+        # Изменения внутри блока применяются в памяти сразу, а на диск уходят
+        # одной записью при выходе из внешнего блока:
+        #     with manager.batch():
+        #         manager.add_note(...)
+        #         manager.delete_note_by_id(...)
+        # При write_behind=True пачка не пишется сразу, а ждёт отложенной записи
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    if self.write_behind:
+                        self._schedule_flush()
+                    else:
+                        self.flush()
+
+    @recorded(describe_add)
+    def add_many(self, notes):
+        # notes - пары (заголовок, текст) или, при импорте, четвёрки (заголовок, текст,
+        # создана, изменена) с датами как datetime или секунды; возвращает номера новых заметок
+        note_ids = []
+        with self.batch():
+            for title, body, *moments in notes:
+                note_id = self.allocate_id()
+                if not moments:
+                    current_time = current_moscow_time()
+                    moments = (current_time, current_time)
+                note = Note(note_id, title, body, created_at=moments[0], updated_at=moments[1])
+                self.notes_by_id[note_id] = note
+                self._index_note(note)
+                self._commit('add', note)
+                note_ids.append(note_id)
+        return note_ids
+
+    @recorded(describe_edit)
+    def edit_many(self, notes):
+        # notes - тройки (номер, заголовок, текст); возвращает число найденных и изменённых заметок
+        notes = list(notes)
+        edited = 0
+        with self.batch():
+            if self.created_index is not None and len(notes) > BATCH_INDEX_REBUILD:
+                # Каждая правка сдвигает хвост отсортированных индексов по датам -
+                # для большой пачки дешевле перестроить их при следующем запросе
+                self.created_index = self.updated_index = None
+            for note_id, title, body in notes:
+                note = self.notes_by_id.get(note_id)
+                if note is None:
+                    continue
+                self._unindex_note(note)
+                note.title = title
+                note.body = body
+                note.updated_at = current_moscow_time()
+                self._index_note(note)
+                self._commit('put', note)
+                edited += 1
+        return edited
+
+    @recorded(describe_delete)
+    def delete_many(self, note_ids):
+        # Возвращает число удалённых заметок; отсутствующие номера пропускаются
+        deleted = 0
+        with self.batch():
+            for note_id in note_ids:
+                note = self.notes_by_id.pop(note_id, None)
+                if note is None:
+                    continue
+                self._drop_note(note)
+                self._commit('del', note)
+                deleted += 1
+        return deleted
 
     def add_note(self, title, body):
-        max_note_id = max([note.note_id for note in self.notes], default=0)
-        new_note_id = max_note_id + 1
-        moscow_timezone = timezone(timedelta(hours=3))
-        current_time = datetime.now(moscow_timezone)
-        new_note = Note(new_note_id, title, body, created_at=current_time, updated_at=current_time)
-        self.notes.append(new_note)
-        self.save_notes()
+        self.add_many([(title, body)])
         print("\nЗаметка успешно добавлена.")
 
     def edit_note(self, note_id, title, body):
-        for note in self.notes:
-            if note.note_id == note_id:
-                note.title = title
-                note.body = body
-                note.updated_at = datetime.now(timezone(timedelta(hours=3)))
-                self.save_notes()
-                print("\nЗаметка успешно отредактирована.")
-                return
-        print("Заметка не найдена.")
+        if self.edit_many([(note_id, title, body)]):
+            print("\nЗаметка успешно отредактирована.")
+        else:
+            print("Заметка не найдена.")
 
     def delete_note_by_id(self, note_id):
-        for note in self.notes:
-            if note.note_id == note_id:
-                self.notes.remove(note)
-                self.save_notes()
-                print("\nЗаметка успешно удалена.")
-                return True
+        if self.delete_many([note_id]):
+            print("\nЗаметка успешно удалена.")
+            return True
         print("Заметка не найдена.")
         return False
 
         
+    @recorded(describe_between)
+    def notes_between(self, start_date, end_date):
+        # Заметки, созданные или изменённые с start_date по end_date включительно.
+        # Если хранилище не загружено, один просмотр файла дешевле загрузки и индексов
+        start = to_timestamp(datetime(start_date.year, start_date.month, start_date.day))
+        end = to_timestamp(datetime(end_date.year, end_date.month, end_date.day) + timedelta(days=1))
+        if self._streaming():
+            return [note for note in self.iter_notes()
+                    if start <= note.created_ts < end or start <= note.updated_ts < end]
+        if self.columnar:
+            return self.notes_by_id.between(start, end)
+        self._build_date_indexes()
+        note_ids = dict.fromkeys(self.created_index.between(start, end))
+        note_ids.update(dict.fromkeys(self.updated_index.between(start, end)))
+        return [self.notes_by_id[note_id] for note_id in note_ids]
+
     def list_notes_by_date(self, date):
-        notes_on_date = [note for note in self.notes if note.created_at.date() == date.date()]
+        notes_on_date = self.notes_between(date, date)
         if notes_on_date:
             print()
             for note in notes_on_date:
                 print(note)
         else:
             print("Нет заметок за указанную дату.")
+
+    def list_notes_between(self, start_date, end_date):
+        notes_in_range = self.notes_between(start_date, end_date)
+        if notes_in_range:
+            print()
+            for note in notes_in_range:
+                print(note)
+        else:
+            print("Нет заметок за указанный период.")
     
    
-    def list_note_by_id(self, note_id, file_format):
-        notes_to_search = self.notes if file_format == "json" else self.notes
-        notes_found = [note for note in notes_to_search if note.note_id == note_id]
+    @recorded(describe_search)
+    def search(self, query, limit=10):
+        # Заметки, подходящие под запрос, от наиболее к наименее релевантной
+        self._build_search_index()
+        return [self.notes_by_id[note_id] for note_id, _ in self.search_index.search(query, limit)]
+
+    def list_notes_by_text(self, query):
+        notes_found = self.search(query)
         if notes_found:
-            print(f"Найденная заметка в формате {file_format}:")
+            print()
             for note in notes_found:
                 print(note)
+        else:
+            print("Нет заметок, подходящих под запрос.")
+
+    @recorded(describe_get)
+    def find(self, note_id):
+        # Как get(), но до загрузки хранилища ищет заметку потоком по файлу
+        if self._streaming():
+            note = next((note for note in self.iter_notes() if note.note_id == note_id), None)
+            self._streamed = True
+            return note
+        return self.get(note_id)
+
+    def list_note_by_id(self, note_id, file_format):
+        note = self.find(note_id)
+        if note is not None:
+            print(f"Найденная заметка в формате {file_format}:")
+            print(note)
         else:
             if file_format == "json":
                 print("Нет заметки в формате JSON с указанным номером.")
             elif file_format == "csv":
                 print("Нет заметки в формате CSV с указанным номером.")
+            else:
+                print("Нет заметки с указанным номером.")
+
+
+class SqliteNoteManager(NoteManager):
+    # Заметки живут в таблице SQLite, а не в списке: каждый метод - один запрос,
+    # поэтому запуск не зависит от размера базы, а правка затрагивает одну строку.
+    # Даты хранятся как "ГГГГ-ММ-ДД ЧЧ:ММ:СС", чтобы индекс сортировал их по времени
+    def __init__(self, file_path, fsync=None, oplog=None, **options):
+        # Отложенная запись, снимок и хранение заметок в памяти есть только у файловых
+        # форматов: молча работать без них было бы хуже, чем отказаться
+        unsupported = [name for name in SQLITE_UNSUPPORTED_OPTIONS if options.get(name)]
+        if unsupported:
+            raise ValueError(f"База SQLite не поддерживает параметры: {', '.join(unsupported)}")
+        if fsync is not None and fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестная политика fsync: {fsync}")
+        self.file_path = file_path
+        self.connection = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        # Отложенной записи нет: каждая пачка - одна транзакция
+        self.write_behind = False
+        # Политика fsync переводится в PRAGMA synchronous; без неё действует значение SQLite (FULL)
+        self.fsync = fsync
+        self.oplog = OperationLog(oplog, file_path) if oplog else None
+        self.load_notes()
+
+    @property
+    def notes_by_id(self):
+        raise TypeError("У базы SQLite нет словаря заметок в памяти: используйте get(), iter_notes() и add_many()")
+
+    def load_notes(self):
+        # Повторный вызов переоткрывает базу: текущее соединение фиксируется и закрывается.
+        # Соединение можно передавать между потоками (bench/replay.py с --concurrency):
+        # вызовы к нему там выполняются по очереди под общей блокировкой
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+        self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        if self.fsync is not None:
+            self.connection.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS[self.fsync]}")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS notes (
+                note_id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS notes_created_at ON notes (created_at);
+            CREATE INDEX IF NOT EXISTS notes_updated_at ON notes (updated_at);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (key, value)
+                VALUES ('next_id', (SELECT COALESCE(MAX(note_id), 0) + 1 FROM notes));
+            CREATE TABLE IF NOT EXISTS search_terms (
+                term TEXT NOT NULL,
+                note_id INTEGER NOT NULL,
+                frequency INTEGER NOT NULL,
+                PRIMARY KEY (term, note_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS search_terms_note_id ON search_terms (note_id);
+            CREATE TABLE IF NOT EXISTS search_documents (
+                note_id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL
+            );
+        """)
+
+    def save_notes(self):
+        self.connection.commit()
+
+    def vacuum(self):
+        # SQLite сам переиспользует место удалённых строк; VACUUM возвращает его системе
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+
+    def compact(self):
+        # Журнала нет - уплотнение базы и есть VACUUM
+        self.vacuum()
+
+    def reserve_ids(self, count):
+        first_id = self.connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()[0]
+        self.connection.execute("UPDATE meta SET value = ? WHERE key = 'next_id'", (first_id + count,))
+        # Вне пачки счётчик фиксируется сразу, иначе после close() блок выдался бы снова
+        if not self._batch_depth:
+            self.connection.commit()
+        return range(first_id, first_id + count)
+
+    def allocate_id(self):
+        return self.reserve_ids(1)[0]
+
+    def _meta_value(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta_value(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _build_search_index(self):
+        # Базы, созданные до появления поиска, индексируются один раз при первом запросе
+        if self._meta_value('search_ready'):
+            return
+        self.connection.execute("DELETE FROM search_terms")
+        self.connection.execute("DELETE FROM search_documents")
+        self._set_meta_value('search_length', 0)
+        for note in self._select(""):
+            self._index_text(note)
+        self._set_meta_value('search_ready', 1)
+        self.save_notes()
+
+    def _index_text(self, note):
+        index = SearchIndex()
+        index.add(note.note_id, note.title, note.body)
+        self.connection.executemany(
+            "INSERT INTO search_terms (term, note_id, frequency) VALUES (?, ?, ?)",
+            ((term, note.note_id, posting[note.note_id]) for term, posting in index.postings.items()))
+        self.connection.execute("INSERT INTO search_documents (note_id, length) VALUES (?, ?)",
+                                (note.note_id, index.total_length))
+        self.connection.execute("UPDATE meta SET value = value + ? WHERE key = 'search_length'",
+                                (index.total_length,))
+
+    def _unindex_text(self, note_id):
+        row = self.connection.execute("SELECT length FROM search_documents WHERE note_id = ?",
+                                      (note_id,)).fetchone()
+        if row is None:
+            return
+        self.connection.execute("DELETE FROM search_terms WHERE note_id = ?", (note_id,))
+        self.connection.execute("DELETE FROM search_documents WHERE note_id = ?", (note_id,))
+        self.connection.execute("UPDATE meta SET value = value - ? WHERE key = 'search_length'", row)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+        if self.oplog is not None:
+            self.oplog.close()
+
+    @property
+    def notes(self):
+        return list(self._select("ORDER BY note_id"))
+
+    def iter_notes(self):
+        return self._select("ORDER BY note_id")
+
+    def _select(self, where, params=()):
+        cursor = self.connection.execute(
+            "SELECT note_id, title, body, created_at, updated_at FROM notes " + where, params)
+        for note_id, title, body, created_at, updated_at in cursor:
+            yield Note(note_id, title, body,
+                       created_at=datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S"),
+                       updated_at=datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S"))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def has_notes(self):
+        return self.connection.execute("SELECT 1 FROM notes LIMIT 1").fetchone() is not None
+
+    @recorded(describe_get)
+    def get(self, note_id):
+        return next(self._select("WHERE note_id = ?", (note_id,)), None)
+
+    @recorded(describe_get)
+    def find(self, note_id):
+        return self.get(note_id)
+
+    def __contains__(self, note_id):
+        row = self.connection.execute("SELECT 1 FROM notes WHERE note_id = ?", (note_id,)).fetchone()
+        return row is not None
+
+    @recorded(describe_list)
+    def print_notes(self):
+        found = False
+        for note in self._select("ORDER BY note_id"):
+            found = True
+            print(note)
+            print()
+        if not found:
+            print("!!! Нет ни одной заметки.")
+
+    def flush(self):
+        # Пачка изменений из batch() фиксируется одной транзакцией
+        self.connection.commit()
+
+    @recorded(describe_add)
+    def add_many(self, notes):
+        note_ids = []
+        with self.batch():
+            search_ready = self._meta_value('search_ready')
+            for title, body, *moments in notes:
+                if not moments:
+                    current_time = current_moscow_time()
+                    moments = (current_time, current_time)
+                note = Note(self.allocate_id(), title, body, created_at=moments[0], updated_at=moments[1])
+                self.connection.execute(
+                    "INSERT INTO notes (note_id, title, body, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (note.note_id, title, body, note.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                     note.updated_at.strftime("%Y-%m-%d %H:%M:%S")))
+                if search_ready:
+                    self._index_text(note)
+                note_ids.append(note.note_id)
+        return note_ids
+
+    @recorded(describe_edit)
+    def edit_many(self, notes):
+        edited = 0
+        with self.batch():
+            search_ready = self._meta_value('search_ready')
+            for note_id, title, body in notes:
+                current_time = current_moscow_time().strftime("%Y-%m-%d %H:%M:%S")
+                cursor = self.connection.execute(
+                    "UPDATE notes SET title = ?, body = ?, updated_at = ? WHERE note_id = ?",
+                    (title, body, current_time, note_id))
+                if cursor.rowcount:
+                    if search_ready:
+                        self._unindex_text(note_id)
+                        self._index_text(Note(note_id, title, body))
+                    edited += 1
+        return edited
+
+    @recorded(describe_delete)
+    def delete_many(self, note_ids):
+        deleted = 0
+        with self.batch():
+            for note_id in note_ids:
+                cursor = self.connection.execute("DELETE FROM notes WHERE note_id = ?", (note_id,))
+                if cursor.rowcount:
+                    self._unindex_text(note_id)
+                    deleted += 1
+        return deleted
+
+    @recorded(describe_between)
+    def notes_between(self, start_date, end_date):
+        start = datetime(start_date.year, start_date.month, start_date.day).strftime("%Y-%m-%d %H:%M:%S")
+        end = (datetime(end_date.year, end_date.month, end_date.day)
+               + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+        return list(self._select(
+            "WHERE (created_at >= ? AND created_at < ?) OR (updated_at >= ? AND updated_at < ?) "
+            "ORDER BY created_at", (start, end, start, end)))
+
+    @recorded(describe_search)
+    def search(self, query, limit=10):
+        self._build_search_index()
+        total_documents = self.connection.execute("SELECT COUNT(*) FROM search_documents").fetchone()[0]
+        if not total_documents:
+            return []
+        average_length = self._meta_value('search_length', 0) / total_documents or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.connection.execute(
+                "SELECT search_terms.note_id, frequency, length FROM search_terms "
+                "JOIN search_documents USING (note_id) WHERE term = ?", (term,)).fetchall()
+            if postings:
+                add_bm25_scores(scores, postings, len(postings), total_documents, average_length)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [self.get(note_id) for note_id, _ in ranked]
+
+    def list_note_by_id(self, note_id, file_format):
+        note = self.get(note_id)
+        if note is not None:
+            print(f"Найденная заметка в формате {file_format}:")
+            print(note)
+        else:
+            print("Нет заметки с указанным номером.")
+
+
+
+class ShardedNoteManager(NoteManager):
+    # Заметки разложены по файлам-шардам по месяцу создания: notes/2026-10.json.
+    # catalog.json хранит счётчик номеров и для каждого шарда число заметок,
+    # диапазон номеров, минимальную и максимальную дату создания и последнюю
+    # дату изменения. При запуске читается только каталог, шарды подгружаются
+    # по мере надобности, а при сохранении переписываются только изменённые
+    def __init__(self, file_path, sharded=True, **options):
+        self.catalog = {}
+        self._loaded_shards = set()
+        self._dirty_shards = set()
+        super().__init__(file_path, **options)
+        # Имя каталога может выглядеть как файл (notes.json), но формат, сжатие и
+        # снимок относятся к одиночным файлам: шарды - всегда несжатый JSON без снимка
+        self.storage_format = None
+        self.codec = None
+        self.snapshot = False
+        self.lazy_bodies = False
+        self.columnar = False
+
+    @property
+    def catalog_path(self):
+        return os.path.join(self.file_path, "catalog.json")
+
+    def shard_path(self, key):
+        return os.path.join(self.file_path, key + ".json")
+
+    @staticmethod
+    def shard_key(created_ts):
+        day = format_timestamp(created_ts)
+        return day[6:10] + "-" + day[3:5]
+
+    def load_notes(self):
+        self._notes_by_id = {}
+        self._loaded_shards = set()
+        self.catalog = {}
+        if not os.path.exists(self.catalog_path):
+            return
+        with open(self.catalog_path, "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+        self.next_id = max(self.next_id, catalog['next_id'])
+        for key, entry in catalog['shards'].items():
+            self.catalog[key] = {
+                'count': entry['count'],
+                'min_id': entry['min_id'],
+                'max_id': entry['max_id'],
+                'min_created': parse_timestamp(entry['min_created']),
+                'max_created': parse_timestamp(entry['max_created']),
+                'max_updated': parse_timestamp(entry['max_updated']),
+            }
+
+    def _load_shard(self, key):
+        self._ensure_loaded()
+        if key in self._loaded_shards:
+            return
+        self._loaded_shards.add(key)
+        if key not in self.catalog:
+            return
+        with open(self.shard_path(key), "r", encoding="utf-8") as file:
+            for note_data in iter_json_array(file):
+                note = self._note_from_record(note_data)
+                self._notes_by_id.setdefault(note.note_id, note)
+
+    def _load_all_shards(self):
+        self._ensure_loaded()
+        unloaded = [key for key in self.catalog if key not in self._loaded_shards]
+        for key in unloaded:
+            self._load_shard(key)
+        if unloaded:
+            # Шарды подгружались вразнобой - возвращаем заметкам порядок по номеру
+            self._notes_by_id = dict(sorted(self._notes_by_id.items()))
+
+    def _load_shards_for_id(self, note_id):
+        self._ensure_loaded()
+        for key, entry in self.catalog.items():
+            if entry['min_id'] <= note_id <= entry['max_id']:
+                self._load_shard(key)
+
+    def save_notes(self):
+        self._ensure_loaded()
+        unloaded = sorted(key for key in self._dirty_shards
+                          if key in self.catalog and key not in self._loaded_shards)
+        if unloaded:
+            # Такой шард переписался бы только заметками из памяти, остальные пропали бы
+            raise RuntimeError(f"Шарды {', '.join(unloaded)} изменены, но не загружены")
+        os.makedirs(self.file_path, exist_ok=True)
+        shards = {key: [] for key in self._dirty_shards}
+        for note in self._notes_by_id.values():
+            notes = shards.get(self.shard_key(note.created_ts))
+            if notes is not None:
+                notes.append(note)
+        for key, notes in shards.items():
+            if notes:
+                self._write_atomically(lambda file: self._write_shard(file, notes), self.shard_path(key))
+                self.catalog[key] = {
+                    'count': len(notes),
+                    'min_id': min(note.note_id for note in notes),
+                    'max_id': max(note.note_id for note in notes),
+                    'min_created': min(note.created_ts for note in notes),
+                    'max_created': max(note.created_ts for note in notes),
+                    'max_updated': max(note.updated_ts for note in notes),
+                }
+            elif key in self.catalog:
+                os.remove(self.shard_path(key))
+                del self.catalog[key]
+        self._dirty_shards.clear()
+        self._write_atomically(self._write_catalog, self.catalog_path)
+
+    def _write_shard(self, file, notes):
+        file.write("[" + ", ".join(json.dumps(self._note_to_record(note), ensure_ascii=False)
+                                   for note in notes) + "]")
+
+    def _write_catalog(self, file):
+        json.dump({
+            'next_id': self.next_id,
+            'shards': {key: {
+                'count': entry['count'],
+                'min_id': entry['min_id'],
+                'max_id': entry['max_id'],
+                'min_created': format_timestamp(entry['min_created']),
+                'max_created': format_timestamp(entry['max_created']),
+                'max_updated': format_timestamp(entry['max_updated']),
+            } for key, entry in sorted(self.catalog.items())}
+        }, file, ensure_ascii=False, indent=2)
+
+    def _commit(self, op, note):
+        self._dirty_shards.add(self.shard_key(note.created_ts))
+        super()._commit(op, note)
+
+    def compact(self):
+        self.save_notes()
+
+    @property
+    def notes(self):
+        self._load_all_shards()
+        return super().notes
+
+    def iter_notes(self):
+        self._load_all_shards()
+        return iter(list(self._notes_by_id.values()))
+
+    def __len__(self):
+        self._ensure_loaded()
+        unloaded = sum(entry['count'] for key, entry in self.catalog.items() if key not in self._loaded_shards)
+        return unloaded + len(self._notes_by_id)
+
+    def has_notes(self):
+        return len(self) > 0
+
+    @recorded(describe_get)
+    def get(self, note_id):
+        self._load_shards_for_id(note_id)
+        return super().get(note_id)
+
+    def __contains__(self, note_id):
+        self._load_shards_for_id(note_id)
+        return super().__contains__(note_id)
+
+    @recorded(describe_list)
+    def print_notes(self):
+        self._load_all_shards()
+        super().print_notes()
+
+    @recorded(describe_add)
+    def add_many(self, notes):
+        # Шард каждой новой заметки подгружается заранее, иначе при сохранении он
+        # был бы переписан одними новыми заметками. Время без дат фиксируется здесь,
+        # чтобы заметка попала в тот шард, который загружен
+        current_time = current_moscow_time()
+        notes = [(title, body, *moments) if moments else (title, body, current_time, current_time)
+                 for title, body, *moments in notes]
+        for _, _, created_at, _ in notes:
+            self._load_shard(self.shard_key(created_at if isinstance(created_at, int) else to_timestamp(created_at)))
+        return super().add_many(notes)
+
+    @recorded(describe_edit)
+    def edit_many(self, notes):
+        notes = list(notes)
+        for note_id, _, _ in notes:
+            self._load_shards_for_id(note_id)
+        return super().edit_many(notes)
+
+    @recorded(describe_delete)
+    def delete_many(self, note_ids):
+        note_ids = list(note_ids)
+        for note_id in note_ids:
+            self._load_shards_for_id(note_id)
+        return super().delete_many(note_ids)
+
+    def list_note_by_id(self, note_id, file_format):
+        self._load_shards_for_id(note_id)
+        super().list_note_by_id(note_id, file_format)
+
+    def _build_search_index(self):
+        self._load_all_shards()
+        super()._build_search_index()
+
+    @recorded(describe_between)
+    def notes_between(self, start_date, end_date):
+        # Открываются только шарды, чей диапазон дат из каталога пересекает период;
+        # загруженные заметки проверяются напрямую - среди них могут быть несохранённые правки
+        self._ensure_loaded()
+        start = to_timestamp(datetime(start_date.year, start_date.month, start_date.day))
+        end = to_timestamp(datetime(end_date.year, end_date.month, end_date.day) + timedelta(days=1))
+        for key, entry in self.catalog.items():
+            if entry['min_created'] < end and max(entry['max_created'], entry['max_updated']) >= start:
+                self._load_shard(key)
+        return [note for note in self._notes_by_id.values()
+                if start <= note.created_ts < end or start <= note.updated_ts < end]
+
+
+class BinaryNoteManager(NoteManager):
+    # Файл .notesbin отображается в память через mmap и ничего не разбирает при
+    # открытии: столбцы читаются как memoryview прямо из отображения, поиск по
+    # номеру - бинарный поиск по столбцу номеров, выборка по дате - проход по
+    # столбцам дат. Строки декодируются только у заметок, которые отдаются наружу.
+    # Первое изменение переносит заметки в словарь, сохранение переписывает файл
+    # целиком. После этого работа идёт со словарём: если снова отобразить файл,
+    # следующая правка декодировала бы его заново. Через mmap файл заново
+    # открывает только явный вызов load_notes()
+    def __init__(self, file_path, **options):
+        if sys.byteorder != 'little':
+            raise ValueError("Формат .notesbin поддерживается только на little-endian машинах")
+        self.mapping = None
+        self.ids = None
+        self.created_column = None
+        self.updated_column = None
+        self.text_offsets = None
+        self.texts = None
+        super().__init__(file_path, **options)
+
+    def load_notes(self):
+        self._close_mapping()
+        self._notes_by_id = None
+        if not os.path.exists(self.file_path) or not os.path.getsize(self.file_path):
+            self._notes_by_id = {}
+            return
+        with open(self.file_path, "rb") as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, next_id = BINARY_HEADER.unpack_from(self.mapping)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            self._close_mapping()
+            raise ValueError(f"Файл {self.file_path} не является файлом .notesbin")
+        self.next_id = max(self.next_id, next_id)
+        view = memoryview(self.mapping)
+        position = BINARY_HEADER.size
+        columns = []
+        for size in (count, count, count, 2 * count + 1):
+            columns.append(view[position:position + 8 * size].cast('q'))
+            position += 8 * size
+        self.ids, self.created_column, self.updated_column, self.text_offsets = columns
+        self.texts = view[position:]
+        view.release()
+
+    def _close_mapping(self):
+        # mmap нельзя закрыть, пока на него есть memoryview
+        for column in (self.ids, self.created_column, self.updated_column, self.text_offsets, self.texts):
+            if column is not None:
+                column.release()
+        self.ids = self.created_column = self.updated_column = self.text_offsets = self.texts = None
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    def _ensure_loaded(self):
+        if self.mapping is None and self._notes_by_id is None:
+            self.load_notes()
+
+    @property
+    def notes_by_id(self):
+        # Правки идут через словарь: при первой из них заметки читаются из отображения
+        self._ensure_loaded()
+        if self._notes_by_id is None:
+            self._notes_by_id = {note.note_id: note for note in self._iter_mapped()}
+        return self._notes_by_id
+
+    def _mapped(self):
+        self._ensure_loaded()
+        return self._notes_by_id is None
+
+    def _note_at(self, index):
+        offsets = self.text_offsets
+        title_start, body_start, body_end = offsets[2 * index], offsets[2 * index + 1], offsets[2 * index + 2]
+        return Note(self.ids[index], str(self.texts[title_start:body_start], "utf-8"),
+                    str(self.texts[body_start:body_end], "utf-8"),
+                    self.created_column[index], self.updated_column[index])
+
+    def _iter_mapped(self):
+        for index in range(len(self.ids)):
+            yield self._note_at(index)
+
+    def _index_of(self, note_id):
+        index = bisect_left(self.ids, note_id)
+        if index < len(self.ids) and self.ids[index] == note_id:
+            return index
+        return None
+
+    def save_notes(self):
+        # Windows не заменяет файл, пока на него открыто отображение: заметки
+        # сначала переносятся в словарь, отображение закрывается, затем файл переписывается
+        self.notes_by_id
+        self._close_mapping()
+        self._write_atomically(self._write_binary, binary=True)
 
+    def _write_binary(self, file):
+        notes = sorted(self.notes_by_id.values(), key=lambda note: note.note_id)
+        file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(notes), self.next_id))
+        file.write(array('q', [note.note_id for note in notes]).tobytes())
+        file.write(array('q', [note.created_ts for note in notes]).tobytes())
+        file.write(array('q', [note.updated_ts for note in notes]).tobytes())
+        texts = []
+        offsets = array('q')
+        position = 0
+        for note in notes:
+            for text in (note.title, note.body):
+                data = text.encode("utf-8")
+                offsets.append(position)
+                texts.append(data)
+                position += len(data)
+        offsets.append(position)
+        file.write(offsets.tobytes())
+        for data in texts:
+            file.write(data)
 
+    def compact(self):
+        self.save_notes()
+
+    def close(self):
+        super().close()
+        self._close_mapping()
+
+    @property
+    def notes(self):
+        return list(self.iter_notes())
+
+    def iter_notes(self):
+        if self._mapped():
+            return self._iter_mapped()
+        return iter(list(self._notes_by_id.values()))
+
+    def __len__(self):
+        if self._mapped():
+            return len(self.ids)
+        return len(self._notes_by_id)
+
+    @recorded(describe_get)
+    def get(self, note_id):
+        if not self._mapped():
+            return self._notes_by_id.get(note_id)
+        index = self._index_of(note_id)
+        return None if index is None else self._note_at(index)
+
+    def __contains__(self, note_id):
+        if not self._mapped():
+            return note_id in self._notes_by_id
+        return self._index_of(note_id) is not None
 
-def get_date_from_input():
+    def _build_search_index(self):
+        if self.search_index is None:
+            self.search_index = SearchIndex()
+            for note in self.iter_notes():
+                self.search_index.add(note.note_id, note.title, note.body)
+
+    @recorded(describe_search)
+    def search(self, query, limit=10):
+        self._build_search_index()
+        return [self.get(note_id) for note_id, _ in self.search_index.search(query, limit)]
+
+    @recorded(describe_between)
+    def notes_between(self, start_date, end_date):
+        if not self._mapped():
+            return super().notes_between(start_date, end_date)
+        start = to_timestamp(datetime(start_date.year, start_date.month, start_date.day))
+        end = to_timestamp(datetime(end_date.year, end_date.month, end_date.day) + timedelta(days=1))
+        return [self._note_at(index)
+                for index, (created_ts, updated_ts) in enumerate(zip(self.created_column, self.updated_column))
+                if start <= created_ts < end or start <= updated_ts < end]
+
+
+def get_date_from_input(prompt="\nВведите дату в формате ДД-ММ-ГГГГ: "):
     while True:
-        date_str = input("\nВведите дату в формате ДД-ММ-ГГГГ: ")
+        date_str = input(prompt)
         try:
             date = datetime.strptime(date_str, "%d-%m-%Y")
             return date
@@ -156,9 +2131,12 @@ def get_date_from_input():
             print("\n!!! Вы ввели неправильный формат даты. Пожалуйста, введите дату в формате ДД-ММ-ГГГГ.")
 
 
-def main():
-    json_manager = NoteManager("notes.json")
-    csv_manager = NoteManager("notes.csv")
+def main(oplog=None):
+    # Файлы не читаются при запуске: хранилище загружается при первой правке,
+    # а первый просмотр (пункты 1, 5, 6) читает файл потоком; следующие работают
+    # с загруженным хранилищем, а при выходе записывается снимок
+    json_manager = NoteManager("notes.json", preload=False, oplog=oplog)
+    csv_manager = NoteManager("notes.csv", preload=False, oplog=oplog)
 
     while True:
         print("\nМеню:")
@@ -168,163 +2146,382 @@ def main():
         print("4. Удалить заметку")
         print("5. Вывести заметки за определенную дату")
         print("6. Вывести заметку по номеру")
+        # Номер выхода остался прежним, новые пункты идут после него
         print("7. Выход")
+        print("8. Вывести заметки за период")
+        print("9. Найти заметки по тексту")
 
 
         choice = input("\nВведите ваш выбор: ")
 
-        if choice == "1":
-            print("\nВывожу заметки в формате JSON:\n")
-            json_manager.print_notes()
-            print("\nВывожу заметки в формате CSV:\n")
-            csv_manager.print_notes()
-        elif choice == "2":
-            while True:
-                format_choice = input("\nВыберите формат файла для новой заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 - JSON или 2 - CSV (или 0 для выхода в меню): ")
-                if format_choice == "1":
-                    title = input("\nВведите заголовок для заметки: ")
-                    body = input("Введите текст: ")
-                    json_manager.add_note(title, body)
-                    break
-                elif format_choice == "2":
-                    title = input("\nВведите заголовок для заметки: ")
-                    body = input("Введите текст: ")
-                    csv_manager.add_note(title, body)
-                    break
-                elif format_choice == "0":
-                    print("Выход в меню.")
-                    break
-                else:
-                    print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
-                    continue  # Возвращаемся к запросу выбора формата заметки
+        # При включённом профилировании каждый пункт меню - отдельная операция
+        label = f"menu-{choice}" if len(choice) == 1 and choice.isdigit() else "menu"
+        with profiling.operation(label):
+            if choice == "1":
+                print("\nВывожу заметки в формате JSON:\n")
+                json_manager.print_notes()
+                print("\nВывожу заметки в формате CSV:\n")
+                csv_manager.print_notes()
+            elif choice == "2":
+                while True:
+                    format_choice = input("\nВыберите формат файла для новой заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 - JSON или 2 - CSV (или 0 для выхода в меню): ")
+                    if format_choice == "1":
+                        title = input("\nВведите заголовок для заметки: ")
+                        body = input("Введите текст: ")
+                        json_manager.add_note(title, body)
+                        break
+                    elif format_choice == "2":
+                        title = input("\nВведите заголовок для заметки: ")
+                        body = input("Введите текст: ")
+                        csv_manager.add_note(title, body)
+                        break
+                    elif format_choice == "0":
+                        print("Выход в меню.")
+                        break
+                    else:
+                        print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
+                        continue  # Возвращаемся к запросу выбора формата заметки
 
 
-        elif choice == "3":
-            while True:
-                format_choice = input("\nВыберите формат файла для редактирования заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 - JSON или 2 - CSV (или 0 для выхода в меню): ")
+            elif choice == "3":
+                while True:
+                    format_choice = input("\nВыберите формат файла для редактирования заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 - JSON или 2 - CSV (или 0 для выхода в меню): ")
+
+                    if format_choice == "1":
+                        note_manager = json_manager
+                    elif format_choice == "2":
+                        note_manager = csv_manager
+                    elif format_choice == "0":
+                        print("Выход в меню.")
+                        break
+                    else:
+                        print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2 (или 0 для выхода в меню)")
+                        continue
+
+                    if format_choice == "0":
+                        print("Выход в меню.")
+                        break
+
+                    if not note_manager.has_notes():
+                        print("Нет сохраненных заметок для редактирования.")
+                        break
+
+                    while True:
+                        print("\nЗаметки в выбранном формате:\n")
+                        note_manager.print_notes()
+
+                        try:
+                            note_id = int(input("\nВведите номер заметки для редактирования или введите 0 для выхода: "))
+                        except ValueError:
+                            print("Ошибка: Введите корректный номер заметки (целое число).")
+                            continue
+
+                        if note_id == 0:
+                            print("Выход из редактирования.")
+                            break
+
+                        note_to_edit = note_manager.get(note_id)
+
+                        if note_to_edit:
+                            print("\nВыбранная заметка для редактирования:\n")
+                            print(note_to_edit)
+                            title = input("\nВведите новый заголовок для заметки: ")
+                            body = input("Введите новый текст для заметки: ")
+                            note_manager.edit_note(note_id, title, body)
+                            break
+
+                    if format_choice == "0":
+                        print("Выход в меню.")
+                    break
+
+            elif choice == "4":
+                format_choice = input("\nВыберите формат файла для удаления заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 или 2: ")
+                while format_choice not in ["1", "2"]:
+                    print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
+                    format_choice = input("\nВыберите формат файла для удаления заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 или 2: ")
 
                 if format_choice == "1":
                     note_manager = json_manager
+                    print("\nВывожу файл в формате JSON:\n")
+                    note_manager.print_notes()
                 elif format_choice == "2":
                     note_manager = csv_manager
-                elif format_choice == "0":
-                    print("Выход в меню.")
-                    break
-                else:
-                    print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2 (или 0 для выхода в меню)")
-                    continue
-
-                if format_choice == "0":
-                    print("Выход в меню.")
-                    break
+                    print("\nВывожу файл в формате CSV:\n")
+                    note_manager.print_notes()
 
-                if not note_manager.notes:
-                    print("Нет сохраненных заметок для редактирования.")
-                    break
+                if not note_manager.has_notes():
+                    #print("Нет ни одной заметки.")
+                    continue  # Возвращаемся в главное меню
 
                 while True:
-                    print("\nЗаметки в выбранном формате:\n")
-                    note_manager.print_notes()
-
                     try:
-                        note_id = int(input("\nВведите номер заметки для редактирования или введите 0 для выхода: "))
+                        note_id = int(input("\nВведите номер заметки для удаления: "))
+                        if note_id in note_manager:
+                            break
+                        else:
+                            print("\n!!! Нет заметки с таким номером.")
                     except ValueError:
-                        print("Ошибка: Введите корректный номер заметки (целое число).")
-                        continue
+                        print("\nВведите корректный номер заметки (целое число).")
 
-                    if note_id == 0:
-                        print("Выход из редактирования.")
-                        break
+                note_manager.delete_note_by_id(note_id)
+
+            elif choice == "5":
+                date = get_date_from_input()
+                print("\nВывожу заметки за указанную дату:\n")
+                json_manager.list_notes_by_date(date)
+                csv_manager.list_notes_by_date(date)
 
-                    note_to_edit = None
-                    for note in note_manager.notes:
-                        if note.note_id == note_id:
-                            note_to_edit = note
+            elif choice == "6":
+                if json_manager.has_notes() or csv_manager.has_notes():
+                    while True:
+                        note_id_input = input("Введите номер заметки для просмотра (или введите 0 для выхода): ").strip()
+                        if note_id_input == "0":
+                            print("Выход в меню.")
                             break
+                        try:
+                            note_id = int(note_id_input)
+                            if note_id <= 0:
+                                print("Ошибка: Введите положительный номер заметки.")
+                                continue
+                        except ValueError:
+                            print("Ошибка: Введите корректный номер заметки (целое число).")
+                            continue
 
-                    if note_to_edit:
-                        print("\nВыбранная заметка для редактирования:\n")
-                        print(note_to_edit)
-                        title = input("\nВведите новый заголовок для заметки: ")
-                        body = input("Введите новый текст для заметки: ")
-                        note_manager.edit_note(note_id, title, body)
-                        break
+                        format_choice = input("Выберите формат файла для вывода заметки по номеру:\n1. JSON\n2. CSV\nВведите номер: ")
+                        if format_choice == "1":
+                            json_manager.list_note_by_id(note_id, "json")
+                        elif format_choice == "2":
+                            csv_manager.list_note_by_id(note_id, "csv")
+                        else:
+                            print("Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
+                else:
+                    print("Нет сохраненных заметок для просмотра.")
+                    continue
+
+            elif choice == "8":
+                start_date = get_date_from_input("\nВведите начальную дату в формате ДД-ММ-ГГГГ: ")
+                end_date = get_date_from_input("Введите конечную дату в формате ДД-ММ-ГГГГ: ")
+                if end_date < start_date:
+                    start_date, end_date = end_date, start_date
+                print("\nВывожу заметки за указанный период:\n")
+                json_manager.list_notes_between(start_date, end_date)
+                csv_manager.list_notes_between(start_date, end_date)
 
-                if format_choice == "0":
-                    print("Выход в меню.")
+            elif choice == "9":
+                query = input("\nВведите слова для поиска: ").strip()
+                if not query:
+                    print("Пустой запрос.")
+                    continue
+                print("\nЗаметки в формате JSON:")
+                json_manager.list_notes_by_text(query)
+                print("\nЗаметки в формате CSV:")
+                csv_manager.list_notes_by_text(query)
+
+            elif choice == "7":
+                json_manager.close()
+                csv_manager.close()
+                print("Завершение программы.")
                 break
+            else:
+                print("Неверный выбор. Пожалуйста, попробуйте еще раз.")
 
-        elif choice == "4":
-            format_choice = input("\nВыберите формат файла для удаления заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 или 2: ")
-            while format_choice not in ["1", "2"]:
-                print("\n!!! Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
-                format_choice = input("\nВыберите формат файла для удаления заметки:\n1. JSON\n2. CSV\n\nВведите номер 1 или 2: ")
 
-            if format_choice == "1":
-                note_manager = json_manager
-                print("\nВывожу файл в формате JSON:\n")
-                note_manager.print_notes()
-            elif format_choice == "2":
-                note_manager = csv_manager
-                print("\nВывожу файл в формате CSV:\n")
-                note_manager.print_notes()
-
-            if not note_manager.notes:
-                #print("Нет ни одной заметки.")
-                continue  # Возвращаемся в главное меню
-
-            while True:
-                try:
-                    note_id = int(input("\nВведите номер заметки для удаления: "))
-                    if any(note.note_id == note_id for note in note_manager.notes):
-                        break
-                    else:
-                        print("\n!!! Нет заметки с таким номером.")
-                except ValueError:
-                    print("\nВведите корректный номер заметки (целое число).")
+def parse_date(text):
+    return datetime.strptime(text, "%d-%m-%Y")
 
-            note_manager.delete_note_by_id(note_id)
 
-        elif choice == "5":
-            date = get_date_from_input()
-            print("\nВывожу заметки за указанную дату:\n")
-            json_manager.list_notes_by_date(date)
-            csv_manager.list_notes_by_date(date)
+def run_operation(manager, operation):
+    # Одна операция командной строки или пакетного режима: словарь с ключом op ->
+    # словарь-результат с ключом ok и данными или текстом ошибки
+    op = operation.get('op')
+    try:
+        if op == 'add':
+            note_ids = manager.add_many([(operation['title'], operation['body'])])
+            return {'ok': True, 'note_id': note_ids[0]}
+        if op == 'edit':
+            if manager.edit_many([(int(operation['note_id']), operation['title'], operation['body'])]):
+                return {'ok': True}
+            return {'ok': False, 'error': "Заметка не найдена"}
+        if op == 'delete':
+            if manager.delete_many([int(operation['note_id'])]):
+                return {'ok': True}
+            return {'ok': False, 'error': "Заметка не найдена"}
+        if op == 'get':
+            note = manager.find(int(operation['note_id']))
+            if note is None:
+                return {'ok': False, 'error': "Заметка не найдена"}
+            return {'ok': True, 'note': manager._note_to_record(note)}
+        if op == 'list':
+            notes = manager.iter_notes()
+        elif op == 'by-date':
+            start_date = parse_date(operation['date'])
+            end_date = parse_date(operation.get('end', operation['date']))
+            notes = manager.notes_between(min(start_date, end_date), max(start_date, end_date))
+        elif op == 'search':
+            notes = manager.search(operation['query'], int(operation.get('limit', 10)))
+        else:
+            return {'ok': False, 'error': f"Неизвестная операция: {op}"}
+        return {'ok': True, 'notes': [manager._note_to_record(note) for note in notes]}
+    except (KeyError, TypeError, ValueError) as error:
+        return {'ok': False, 'error': f"Некорректная операция {op}: {error!r}"}
 
-        elif choice == "6":
-            if json_manager.notes or csv_manager.notes:
-                while True:
-                    note_id_input = input("Введите номер заметки для просмотра (или введите 0 для выхода): ").strip()
-                    if note_id_input == "0":
-                        print("Выход в меню.")
-                        break
-                    try:
-                        note_id = int(note_id_input)
-                        if note_id <= 0:
-                            print("Ошибка: Введите положительный номер заметки.")
-                            continue
-                    except ValueError:
-                        print("Ошибка: Введите корректный номер заметки (целое число).")
-                        continue
 
-                    format_choice = input("Выберите формат файла для вывода заметки по номеру:\n1. JSON\n2. CSV\nВведите номер: ")
-                    if format_choice == "1":
-                        json_manager.list_note_by_id(note_id, "json")
-                    elif format_choice == "2":
-                        csv_manager.list_note_by_id(note_id, "csv")
-                    else:
-                        print("Неправильный выбор формата. Пожалуйста, выберите 1 или 2.")
+def run_batch(manager, lines, output):
+    # Операции JSON Lines выполняются в одном процессе над одним хранилищем и
+    # сохраняются одной записью в конце; результаты выводятся по мере выполнения.
+    # Возвращает число неудачных операций
+    failed = 0
+    with manager.batch():
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                operation = json.loads(line)
+            except ValueError as error:
+                result = {'ok': False, 'error': f"Строка не является JSON: {error}"}
             else:
-                print("Нет сохраненных заметок для просмотра.")
+                if isinstance(operation, dict):
+                    result = run_operation(manager, operation)
+                else:
+                    result = {'ok': False, 'error': "Операция должна быть объектом JSON"}
+            failed += not result['ok']
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return failed
+
+
+def export_notes(manager, output):
+    # Записи put журнала .jsonl: выгрузка сама является хранилищем и принимается import
+    for note in manager.iter_notes():
+        record = {'op': 'put'}
+        record.update(manager._note_to_record(note))
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_import(source):
+    # "-" - записи JSON Lines со стандартного ввода (в том виде, как их выводит export),
+    # иначе - хранилище любого формата. Заметки получают новые номера, даты сохраняются
+    if source == "-":
+        for line in sys.stdin:
+            if not line.strip():
                 continue
+            record = json.loads(line)
+            if 'created_at' in record:
+                yield (record['title'], record['body'], parse_timestamp(record['created_at']),
+                       parse_timestamp(record.get('updated_at', record['created_at'])))
+            else:
+                yield record['title'], record['body']
+    else:
+        # Источник только читается: снимок рядом с чужим файлом не создаётся
+        manager = NoteManager(source, preload=False, snapshot=False)
+        try:
+            for note in manager.iter_notes():
+                yield note.title, note.body, note.created_ts, note.updated_ts
+        finally:
+            manager.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Заметки в файле. Без команды запускается интерактивное меню.")
+    parser.add_argument("--file", default="notes.json",
+                        help="файл хранилища, формат определяется по расширению (по умолчанию notes.json)")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="ФАЙЛ",
+                        help="выполнить операции JSON Lines из файла или со стандартного ввода")
+    parser.add_argument("--record", action="store_true", help="записывать операции в журнал JSON Lines")
+    parser.add_argument("--oplog", default=OPLOG_PATH, metavar="ФАЙЛ",
+                        help=f"журнал операций для --record (по умолчанию {OPLOG_PATH})")
+    parser.add_argument("--profile", choices=profiling.PROFILE_MODES, default=os.environ.get(profiling.PROFILE_ENV),
+                        help=f"профилировать каждую операцию: cpu - cProfile, memory - tracemalloc, all - оба"
+                             f" (или переменная окружения {profiling.PROFILE_ENV})")
+    parser.add_argument("--profile-dir", metavar="КАТАЛОГ",
+                        default=os.environ.get(profiling.PROFILE_DIR_ENV, profiling.PROFILE_DIR),
+                        help=f"каталог профилей (по умолчанию {profiling.PROFILE_DIR}"
+                             f" или переменная окружения {profiling.PROFILE_DIR_ENV})")
+    commands = parser.add_subparsers(dest="command", metavar="команда")
+    command = commands.add_parser("add", help="добавить заметку")
+    command.add_argument("title")
+    command.add_argument("body")
+    command = commands.add_parser("edit", help="изменить заметку")
+    command.add_argument("note_id", type=int)
+    command.add_argument("title")
+    command.add_argument("body")
+    command = commands.add_parser("delete", help="удалить заметку")
+    command.add_argument("note_id", type=int)
+    commands.add_parser("list", help="вывести все заметки")
+    command = commands.add_parser("by-date", help="заметки за дату или период (ДД-ММ-ГГГГ)")
+    command.add_argument("date")
+    command.add_argument("end", nargs="?")
+    command = commands.add_parser("get", help="заметка по номеру")
+    command.add_argument("note_id", type=int)
+    command = commands.add_parser("search", help="поиск по тексту")
+    command.add_argument("query")
+    command.add_argument("--limit", type=int, default=10)
+    command = commands.add_parser("import", help="добавить заметки из хранилища или JSON Lines (- для stdin)")
+    command.add_argument("source")
+    commands.add_parser("export", help="выгрузить заметки в JSON Lines на стандартный вывод")
+    command = commands.add_parser("profile-summary", help="сводка по профилям операций")
+    command.add_argument("directory", nargs="?", default=profiling.PROFILE_DIR)
+    command.add_argument("--limit", type=int, default=20)
+    return parser
+
+
+def enable_profiling(mode, directory=profiling.PROFILE_DIR):
+    # Открытые методы хранилищ оборачиваются только здесь: пока профилирование
+    # не включено, вызовы идут напрямую
+    profiler = profiling.start(mode, directory)
+    profiling.instrument(NoteManager, SqliteNoteManager, ShardedNoteManager, BinaryNoteManager)
+    return profiler
+
+
+def cli(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch is not None and args.command is not None:
+        parser.error("--batch и команда не используются вместе")
+    if args.command == "profile-summary":
+        profiling.summarize(args.directory, sys.stdout, args.limit)
+        return 0
+    if args.profile:
+        # argparse не проверяет choices у значения по умолчанию, взятого из окружения
+        if args.profile not in profiling.PROFILE_MODES:
+            parser.error(f"{profiling.PROFILE_ENV}: недопустимый режим {args.profile!r}"
+                         f" (допустимы {', '.join(profiling.PROFILE_MODES)})")
+        enable_profiling(args.profile, args.profile_dir)
+    try:
+        return run_cli(args)
+    finally:
+        profiling.stop()
+
 
-        elif choice == "7":
-            print("Завершение программы.")
-            break
+def run_cli(args):
+    oplog = args.oplog if args.record else None
+    if args.batch is None and args.command is None:
+        main(oplog)
+        return 0
+    manager = NoteManager(args.file, preload=False, oplog=oplog)
+    try:
+        if args.batch == "-":
+            return 1 if run_batch(manager, sys.stdin, sys.stdout) else 0
+        if args.batch is not None:
+            with open(args.batch, "r", encoding="utf-8") as file:
+                return 1 if run_batch(manager, file, sys.stdout) else 0
+        if args.command == "export":
+            export_notes(manager, sys.stdout)
+            return 0
+        if args.command == "import":
+            result = {'ok': True, 'imported': len(manager.add_many(read_import(args.source)))}
         else:
-            print("Неверный выбор. Пожалуйста, попробуйте еще раз.")
+            operation = {key: value for key, value in vars(args).items()
+                         if key not in ('file', 'batch', 'record', 'oplog', 'profile', 'profile_dir', 'command')
+                         and value is not None}
+            operation['op'] = args.command
+            result = run_operation(manager, operation)
+        print(json.dumps(result, ensure_ascii=False))
+        return 0 if result['ok'] else 1
+    finally:
+        manager.close()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli(sys.argv[1:]))
 
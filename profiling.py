@@ -0,0 +1,189 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from inspect import isfunction, isgeneratorfunction
+from itertools import count
+
+PROFILE_ENV = "NOTES_PROFILE"
+PROFILE_DIR_ENV = "NOTES_PROFILE_DIR"
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ('cpu', 'memory', 'all')
+INDEX_NAME = "index.jsonl"
+# Сколько мест выделения памяти сохраняется для каждой операции
+MEMORY_SITES = 20
+# Ожидание ввода в меню - не работа программы, в сводке оно только мешает
+IGNORED_FUNCTIONS = {('~', 0, '<built-in method builtins.input>')}
+
+_profiler = None
+
+
+class Profiler:
+    # Профилирует операции по одной: для каждой пишет в directory файл cProfile
+    # (.prof) и строку в index.jsonl с длительностью, пиком памяти и местами,
+    # где были выделены оставшиеся после операции объекты (по данным tracemalloc).
+    # Профилируется только внешняя операция: вложенные вызовы (add_note -> add_many)
+    # и операции из других потоков, пока идёт текущая, входят в неё или пропускаются
+    def __init__(self, mode, directory=PROFILE_DIR):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.cpu = mode in ('cpu', 'all')
+        self.memory = mode in ('memory', 'all')
+        self.directory = directory
+        self.session = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.numbers = count(1)
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.index = open(os.path.join(directory, INDEX_NAME), "a", encoding="utf-8")
+        self.tracing = self.memory and not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def operation(self, name):
+        if not self.lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            profile = cProfile.Profile() if self.cpu else None
+            if self.memory:
+                tracemalloc.clear_traces()
+                tracemalloc.reset_peak()
+            started = time.perf_counter()
+            if profile is not None:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+                self._write(name, time.perf_counter() - started, profile)
+        finally:
+            self.lock.release()
+
+    def _write(self, name, duration, profile):
+        stem = f"{self.session}-{next(self.numbers):05d}-{name}"
+        record = {'session': self.session, 'name': name, 'duration': round(duration, 9)}
+        if profile is not None:
+            record['profile'] = stem + ".prof"
+            profile.dump_stats(os.path.join(self.directory, record['profile']))
+        if self.memory:
+            _, record['peak'] = tracemalloc.get_traced_memory()
+            # Выделения самого профилировщика (в режиме all cProfile тоже выделяет
+            # память при сборе статистики) в места операции не входят
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, pstats.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            record['sites'] = [{'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                'size': stat.size, 'count': stat.count}
+                               for stat in snapshot.statistics('lineno')[:MEMORY_SITES]]
+        self.index.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.index.flush()
+
+    def close(self):
+        self.index.close()
+        if self.tracing:
+            tracemalloc.stop()
+
+
+def start(mode, directory=PROFILE_DIR):
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(mode, directory)
+    return _profiler
+
+
+def stop():
+    global _profiler
+    if _profiler is not None:
+        _profiler.close()
+        _profiler = None
+
+
+def operation(name):
+    # Контекст одной операции; без включённого профилирования ничего не делает
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.operation(name)
+
+
+def instrument(*classes):
+    # Оборачивает открытые методы классов профилированием. Вызывается только при
+    # включённом профилировании, поэтому без него методы остаются нетронутыми.
+    # Генераторы (iter_notes, batch) работают уже после возврата из вызова -
+    # их время попадает в операцию, которая их обходит
+    for cls in classes:
+        if cls.__dict__.get('_profiled'):
+            continue
+        for name, method in list(vars(cls).items()):
+            if (not name.startswith('_') and isfunction(method)
+                    and not isgeneratorfunction(getattr(method, '__wrapped__', method))):
+                setattr(cls, name, _profiled(method))
+        cls._profiled = True
+
+
+def _profiled(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _profiler is None:
+            return method(self, *args, **kwargs)
+        with _profiler.operation(f"{type(self).__name__}.{method.__name__}"):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def read_index(directory):
+    path = os.path.join(directory, INDEX_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def summarize(directory, output, limit=20):
+    # Сводка по всем операциям каталога: время и память по операциям, самые
+    # затратные функции (по собственному времени) и места выделения памяти
+    records = read_index(directory)
+    if not records:
+        output.write(f"В {directory} нет профилей.\n")
+        return
+    operations = {}
+    for record in records:
+        operations.setdefault(record['name'], []).append(record)
+    sessions = len({record['session'] for record in records})
+    output.write(f"Операций: {len(records)}, сеансов: {sessions}\n\n")
+    output.write(f"{'операция':<36} {'число':>7} {'всего, с':>10} {'макс., мс':>11} {'пик памяти, КБ':>15}\n")
+    for name, items in sorted(operations.items(), key=lambda item: -sum(r['duration'] for r in item[1])):
+        peak = max((record.get('peak', 0) for record in items), default=0)
+        output.write(f"{name:<36} {len(items):>7} {sum(r['duration'] for r in items):>10.3f}"
+                     f" {max(r['duration'] for r in items) * 1000:>11.2f} {peak / 1024:>15.1f}\n")
+
+    profiles = [os.path.join(directory, record['profile']) for record in records
+                if 'profile' in record and os.path.exists(os.path.join(directory, record['profile']))]
+    if profiles:
+        output.write("\nФункции с наибольшим собственным временем:\n")
+        stats = pstats.Stats(*profiles, stream=output)
+        # Без списка файлов: их по одному на операцию
+        stats.files = []
+        for function in IGNORED_FUNCTIONS:
+            stats.stats.pop(function, None)
+        stats.sort_stats('tottime').print_stats(limit)
+
+    sites = {}
+    for record in records:
+        for site in record.get('sites', ()):
+            size, number = sites.get(site['site'], (0, 0))
+            sites[site['site']] = size + site['size'], number + site['count']
+    if sites:
+        output.write("Места выделения памяти, оставшейся после операций:\n")
+        output.write(f"{'КБ':>10} {'объектов':>10}  место\n")
+        for site, (size, number) in sorted(sites.items(), key=lambda item: -item[1][0])[:limit]:
+            output.write(f"{size / 1024:>10.1f} {number:>10}  {site}\n")
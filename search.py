@@ -0,0 +1,128 @@
+import math
+import re
+from functools import lru_cache
+from heapq import nlargest
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Окончания для упрощённого стемминга: отрезается самое длинное подходящее,
+# если от слова остаётся хотя бы MIN_STEM букв
+RUSSIAN_ENDINGS = sorted({
+    # причастия и деепричастия
+    "ившись", "ывшись", "вшись", "ивши", "ывши", "вши", "ив", "ыв",
+    # прилагательные
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+    # глаголы
+    "ла", "на", "ете", "йте", "ли", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно",
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ил", "ыл", "ен", "ило",
+    "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ат", "ать",
+    # существительные
+    "а", "ев", "ов", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "й",
+    "иям", "ям", "ием", "ам", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю",
+    "ия", "ья", "я", "ость", "ости", "остью", "остей",
+}, key=len, reverse=True)
+RUSSIAN_REFLEXIVE = ("ся", "сь")
+ENGLISH_ENDINGS = ("ing", "ed", "es", "s")
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    word = word.casefold().replace("ё", "е")
+    if word.isdigit():
+        return word
+    if "а" <= word[-1] <= "я":
+        for ending in RUSSIAN_REFLEXIVE:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                word = word[:-len(ending)]
+                break
+        endings = RUSSIAN_ENDINGS
+    else:
+        endings = ENGLISH_ENDINGS
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_PATTERN.findall(text)]
+
+
+def add_bm25_scores(scores, postings, document_frequency, total_documents, average_length,
+                    k1=1.2, b=0.75):
+    # postings - тройки (номер заметки, частота терма, длина заметки);
+    # оценки BM25 одного терма прибавляются к scores
+    idf = math.log(1 + (total_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+    length_factor = k1 * b / average_length
+    base = k1 * (1 - b)
+    for note_id, term_frequency, document_length in postings:
+        scores[note_id] = scores.get(note_id, 0.0) + idf * term_frequency * (k1 + 1) / (
+            term_frequency + base + length_factor * document_length)
+
+
+class SearchIndex:
+    # Инвертированный индекс: терм -> {номер заметки: сколько раз встретился}.
+    # Заголовок учитывается дважды, чтобы совпадения в нём ранжировались выше
+    def __init__(self, title_weight=2):
+        self.title_weight = title_weight
+        self.postings = {}
+        self.document_terms = {}
+        self.document_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.document_lengths)
+
+    def state(self):
+        # Содержимое индекса из встроенных типов - его можно сохранить через marshal
+        return self.title_weight, self.postings, self.document_terms, self.document_lengths, self.total_length
+
+    @classmethod
+    def from_state(cls, state):
+        title_weight, postings, document_terms, document_lengths, total_length = state
+        index = cls(title_weight)
+        index.postings = postings
+        index.document_terms = document_terms
+        index.document_lengths = document_lengths
+        index.total_length = total_length
+        return index
+
+    def add(self, note_id, title, body):
+        terms = tokenize(title) * self.title_weight + tokenize(body)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[note_id] = count
+        self.document_terms[note_id] = tuple(counts)
+        self.document_lengths[note_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, note_id):
+        terms = self.document_terms.pop(note_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            del posting[note_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.document_lengths.pop(note_id)
+
+    def search(self, query, limit=10):
+        # Возвращает до limit пар (номер заметки, оценка BM25) по убыванию оценки
+        total_documents = len(self.document_lengths)
+        if not total_documents:
+            return []
+        average_length = self.total_length / total_documents or 1
+        lengths = self.document_lengths
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting:
+                add_bm25_scores(scores, ((note_id, frequency, lengths[note_id])
+                                         for note_id, frequency in posting.items()),
+                                len(posting), total_documents, average_length)
+        return nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,306 @@
+# Запуск из корня проекта: python -m pytest tests (или python -m unittest discover tests)
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import TIME_FORMAT, NoteManager, iter_json_array, parse_timestamp, to_timestamp
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def test_values_split_by_chunk_boundary(self):
+        text = '[1.5e10, 2, true, null, "строка", {"a": [1, 2]}, -0.25]'
+        expected = [1.5e10, 2, True, None, "строка", {"a": [1, 2]}, -0.25]
+        for chunk_size in range(1, len(text) + 1):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), expected, chunk_size)
+
+    def test_number_at_end_of_input(self):
+        self.assertEqual(list(iter_json_array(io.StringIO("[12]"), 2)), [12])
+
+    def test_empty_array_and_trailing_whitespace(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] \n"), 2)), [])
+        self.assertEqual(list(iter_json_array(io.StringIO("[1, 2]\n"), 3)), [1, 2])
+
+    def test_malformed_arrays(self):
+        for text in ("[1,]", "[1, 2 , ]", "[,1]", "[1 2]", "[1]]", "[1] [2]", "[1] x", "[1"):
+            for chunk_size in (1, 3, 64):
+                with self.assertRaises(ValueError, msg=(text, chunk_size)):
+                    list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+class ParseTimestampTest(unittest.TestCase):
+    def test_matches_strptime(self):
+        for text in ("01-01-1970 00:00:00", "29-02-2024 23:59:59", "31-12-2021 12:05:09"):
+            self.assertEqual(parse_timestamp(text), to_timestamp(datetime.strptime(text, TIME_FORMAT)))
+
+    def test_rejects_signs_spaces_and_leap_seconds(self):
+        for text in ("01-01-2020 00:00:-1", "01-01-2020 00:00:+1", "01-01-2020 00:-1:00",
+                     "+1-01-2020 00:00:00", "01-01-2020 00:00:60", "01-01-2020 00:00:61",
+                     "01-01-2020 24:00:00", "30-02-2020 00:00:00", "01-01-2020 00:00:001"):
+            with self.assertRaises(ValueError, msg=text):
+                parse_timestamp(text)
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+
+class ShardedTest(StoreTestCase):
+    def test_add_with_dates_keeps_notes_of_unloaded_shard(self):
+        path = self.path("sh") + "/"
+        manager = NoteManager(path)
+        january = datetime(2020, 1, 5)
+        manager.add_many([("a", "b", january, january), ("c", "d", january, january)])
+        manager.close()
+
+        manager = NoteManager(path)
+        manager.add_many([("e", "f", datetime(2020, 1, 7), datetime(2020, 1, 7))])
+        manager.close()
+
+        manager = NoteManager(path)
+        self.assertEqual(len(manager), 3)
+        self.assertEqual(sorted(note.title for note in manager.iter_notes()), ["a", "c", "e"])
+
+    def test_file_like_directory_name(self):
+        path = self.path("notes.json")
+        manager = NoteManager(path, sharded=True)
+        manager.add_many([("a", "b", datetime(2020, 1, 5), datetime(2020, 1, 5)),
+                          ("c", "d", datetime(2021, 6, 5), datetime(2021, 6, 5))])
+        manager.close()
+        self.assertTrue(os.path.isdir(path))
+
+        manager = NoteManager(path, sharded=True, preload=False)
+        self.assertEqual(manager.find(2).title, "c")
+        # Поиск по номеру открывает только шард, в диапазон которого номер попадает
+        self.assertEqual(manager._loaded_shards, {"2021-06"})
+        manager.close()
+
+    def test_sharded_false_keeps_single_file(self):
+        manager = NoteManager(self.path("notes.json"), sharded=False)
+        self.assertIs(type(manager), NoteManager)
+
+
+class RoundTripTest(StoreTestCase):
+    def titles(self, path, **options):
+        manager = NoteManager(path, **options)
+        titles = {note.note_id: note.title for note in manager.iter_notes()}
+        manager.close()
+        return titles
+
+    def test_delete_reload_vacuum(self):
+        path = self.path("notes.json")
+        manager = NoteManager(path)
+        manager.add_many([("a", "1"), ("b", "2"), ("c", "3")])
+        manager.delete_many([2])
+        manager.close()
+        self.assertTrue(os.path.exists(path + ".deleted"))
+
+        manager = NoteManager(path)
+        self.assertEqual(sorted(manager.notes_by_id), [1, 3])
+        manager.vacuum()
+        manager.close()
+        self.assertFalse(os.path.exists(path + ".deleted"))
+        self.assertEqual(self.titles(path, snapshot=False), {1: "a", 3: "c"})
+
+    def test_journal_replay_after_compaction(self):
+        path = self.path("notes.jsonl")
+        manager = NoteManager(path)
+        manager.add_many([("a", "1"), ("b", "2"), ("c", "3")])
+        manager.edit_many([(1, "a2", "1")])
+        manager.delete_many([2])
+        manager.compact()
+        with open(path, encoding="utf-8") as file:
+            compacted = len(file.readlines())
+        manager.edit_many([(3, "c2", "3")])
+        manager.add_many([("d", "4")])
+        manager.close()
+        with open(path, encoding="utf-8") as file:
+            self.assertEqual(len(file.readlines()), compacted + 2)
+        self.assertEqual(self.titles(path, snapshot=False), {1: "a2", 3: "c2", 4: "d"})
+
+    def test_csv_append_then_external_change_rewrites(self):
+        path = self.path("notes.csv")
+        manager = NoteManager(path)
+        manager.add_many([("a", "1")])
+        with open(path, encoding="utf-8") as file:
+            before = file.read()
+        manager.add_many([("b", "2")])
+        with open(path, encoding="utf-8") as file:
+            self.assertTrue(file.read().startswith(before))
+
+        # Файл изменён снаружи: дописывать в него нельзя, он переписывается из памяти
+        with open(path, "a", encoding="utf-8") as file:
+            file.write("99;x;y;01-01-2020 00:00:00;01-01-2020 00:00:00\n")
+        manager.add_many([("c", "3")])
+        manager.close()
+        self.assertEqual(self.titles(path, snapshot=False), {1: "a", 2: "b", 3: "c"})
+
+    def test_next_id_survives_deleting_last_note(self):
+        cases = [("notes.json", {}), ("notes.json", {"snapshot": False}), ("notes.csv", {}),
+                 ("notes.csv", {"snapshot": False}), ("notes.jsonl", {}), ("notes.jsonl", {"snapshot": False}),
+                 ("notes.notesbin", {}), ("notes.db", {})]
+        for number, (name, options) in enumerate(cases):
+            path = self.path(f"{number}-{name}")
+            manager = NoteManager(path, **options)
+            manager.add_many([("a", "1"), ("b", "2")])
+            manager.delete_many([2])
+            manager.close()
+            manager = NoteManager(path, **options)
+            self.assertEqual(manager.add_many([("c", "3")]), [3], (name, options))
+            manager.close()
+
+
+class SnapshotTest(StoreTestCase):
+    def write_notes(self, path, *titles):
+        manager = NoteManager(path)
+        manager.add_many([(title, "Текст") for title in titles])
+        manager.close()
+        self.assertTrue(os.path.exists(manager.snapshot_path))
+
+    def test_edit_with_same_size_and_time_invalidates_snapshot(self):
+        path = self.path("notes.json")
+        self.write_notes(path, "Первая", "Вторая")
+        stat = os.stat(path)
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text.replace("Первая", "Другая"))
+        # Размер и время изменения те же - правку выдаёт только хэш
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(NoteManager(path).get(1).title, "Другая")
+
+    def test_tombstone_change_invalidates_snapshot(self):
+        path = self.path("notes.json")
+        self.write_notes(path, "Первая", "Вторая")
+        with open(path + ".deleted", "a", encoding="utf-8") as file:
+            file.write("1\n")
+        manager = NoteManager(path)
+        self.assertNotIn(1, manager)
+        self.assertEqual(len(manager), 1)
+
+    def test_bodies_are_read_lazily(self):
+        path = self.path("notes.csv")
+        self.write_notes(path, "Первая")
+        manager = NoteManager(path)
+        self.assertEqual(manager.get(1).body_length, len("Текст".encode("utf-8")))
+        self.assertEqual(manager.get(1).body, "Текст")
+        manager.close()
+
+    def test_has_notes_does_not_load_store(self):
+        path = self.path("notes.json")
+        self.write_notes(path, "Первая")
+        manager = NoteManager(path, preload=False)
+        self.assertTrue(manager.has_notes())
+        self.assertIsNone(manager._notes_by_id)
+
+
+class SearchIndexPersistenceTest(StoreTestCase):
+    def test_index_is_saved_and_reused(self):
+        path = self.path("notes.json")
+        manager = NoteManager(path)
+        manager.add_many([("Покупки", "Купить молоко"), ("Работа", "Обсудить бюджет")])
+        self.assertEqual([note.note_id for note in manager.search("молоко")], [1])
+        manager.close()
+        self.assertTrue(os.path.exists(manager.search_index_path))
+
+        manager = NoteManager(path)
+        self.assertEqual([note.note_id for note in manager.search("бюджет")], [2])
+        self.assertIsNotNone(manager._search_index_fingerprint)
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.edit_note(2, "Работа", "Обсудить отпуск")
+        self.assertEqual(manager.search("бюджет"), [])
+        manager.close()
+
+    def test_stale_index_is_rebuilt(self):
+        path = self.path("notes.json")
+        manager = NoteManager(path)
+        manager.add_many([("Покупки", "Купить молоко")])
+        manager.search("молоко")
+        manager.close()
+
+        manager = NoteManager(path, snapshot=False)
+        manager.add_many([("Молоко", "Ещё молоко")])
+        manager.close()
+        manager = NoteManager(path)
+        self.assertEqual([note.note_id for note in manager.search("молоко")], [2, 1])
+
+
+class WriteBehindTest(StoreTestCase):
+    def test_nothing_is_written_before_flush_delay(self):
+        path = self.path("notes.json")
+        manager = NoteManager(path, write_behind=True, flush_delay=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for number in range(3):
+                manager.add_note(f"Заметка {number}", "Текст")
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(len(manager._pending), 3)
+        self.assertIsNotNone(manager._flush_timer)
+        manager.close()
+        self.assertEqual(len(NoteManager(path)), 3)
+
+
+class BinaryTest(StoreTestCase):
+    def test_save_keeps_notes_in_memory(self):
+        path = self.path("notes.notesbin")
+        manager = NoteManager(path)
+        manager.add_many([("a", "b"), ("c", "d")])
+        notes_by_id = manager._notes_by_id
+        manager.add_many([("e", "f")])
+        manager.delete_many([1])
+        # Сохранение не отображает файл заново - правки идут в тот же словарь
+        self.assertIs(manager._notes_by_id, notes_by_id)
+        self.assertIsNone(manager.mapping)
+        manager.close()
+
+        manager = NoteManager(path)
+        self.assertIsNotNone(manager.mapping)
+        self.assertEqual([note.title for note in manager.iter_notes()], ["c", "e"])
+        manager.close()
+
+
+class SqliteTest(StoreTestCase):
+    def test_batch_is_committed(self):
+        path = self.path("notes.db")
+        manager = NoteManager(path)
+        with manager.batch():
+            manager.add_many([("a", "b"), ("c", "d")])
+        manager.close()
+        self.assertEqual(len(NoteManager(path)), 2)
+
+    def test_file_store_api(self):
+        path = self.path("notes.db")
+        manager = NoteManager(path, fsync='never')
+        self.assertEqual(manager.connection.execute("PRAGMA synchronous").fetchone()[0], 0)
+        manager.add_many([("a", "b"), ("c", "d")])
+        manager.delete_many([1])
+        manager.compact()
+        connection = manager.connection
+        manager.load_notes()
+        # Повторная загрузка закрывает прежнее соединение
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+        self.assertEqual([note.title for note in manager.iter_notes()], ["c"])
+        with self.assertRaises(TypeError):
+            manager.notes_by_id
+        manager.close()
+
+    def test_file_store_options_are_rejected(self):
+        for option in ("write_behind", "snapshot", "lazy_bodies", "columnar"):
+            with self.assertRaises(ValueError):
+                NoteManager(self.path("notes.db"), **{option: True})
+        NoteManager(self.path("notes.db"), snapshot=False).close()
+
+
+if __name__ == "__main__":
+    unittest.main()
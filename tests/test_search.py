@@ -0,0 +1,74 @@
+import marshal
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex, stem, tokenize
+
+
+class StemTest(unittest.TestCase):
+    def test_word_forms_share_stem(self):
+        self.assertEqual(stem("заметки"), stem("заметка"))
+        self.assertEqual(stem("покупками"), stem("покупки"))
+        self.assertEqual(stem("встречаться"), stem("встречать"))
+        self.assertEqual(stem("reviews"), stem("review"))
+
+    def test_short_stem_is_kept(self):
+        self.assertEqual(stem("дом"), "дом")
+        self.assertEqual(stem("2024"), "2024")
+
+    def test_yo_is_e(self):
+        self.assertEqual(stem("Ёлка"), stem("елка"))
+        self.assertEqual(tokenize("ещё всё"), tokenize("еще все"))
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(1, "Покупки", "Купить молоко и хлеб")
+        self.index.add(2, "Работа", "Обсудить бюджет проекта, потом молоко")
+        self.index.add(3, "Молоко", "Молоко, молоко и ещё раз молоко")
+
+    def ids(self, query):
+        return [note_id for note_id, _ in self.index.search(query)]
+
+    def test_bm25_order(self):
+        # Чаще всего и в заголовке слово встречается в третьей заметке, в длинной второй - реже всего
+        self.assertEqual(self.ids("молоко"), [3, 1, 2])
+        self.assertEqual(self.ids("бюджет"), [2])
+        self.assertEqual(self.ids("самолёт"), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("молоко", limit=2)), 2)
+
+    def test_incremental_add_edit_delete(self):
+        self.index.add(4, "Хлеб", "Свежий хлеб")
+        self.assertEqual(self.ids("хлеб"), [4, 1])
+
+        # Правка - удаление старых термов и добавление новых
+        self.index.remove(1)
+        self.index.add(1, "Покупки", "Купить сахар")
+        self.assertEqual(self.ids("хлеб"), [4])
+        self.assertEqual(self.ids("сахар"), [1])
+
+        self.index.remove(4)
+        self.assertEqual(self.ids("хлеб"), [])
+        self.assertNotIn(stem("хлеб"), self.index.postings)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.total_length, sum(self.index.document_lengths.values()))
+
+    def test_remove_missing_note(self):
+        self.index.remove(10)
+        self.assertEqual(len(self.index), 3)
+
+    def test_state_round_trip(self):
+        index = SearchIndex.from_state(marshal.loads(marshal.dumps(self.index.state())))
+        self.assertEqual(index.search("молоко"), self.index.search("молоко"))
+        index.remove(3)
+        self.assertEqual([note_id for note_id, _ in index.search("молоко")], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()